@@ -0,0 +1,665 @@
+import numpy as np
+import pandas as pd
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+TIMES = ['Morning', 'Afternoon', 'Evening']
+CUBE_KEYS = ['Branch', 'Day_of_week', 'Time_of_day', 'Product line']
+
+# Finer time buckets are summed from 15 minute slots of the opening hours
+# of the shifts, 9:00 to 20:59, so any width dividing 4 hours lines up
+SLOT_MINUTES = 15
+FIRST_MINUTE = 9 * 60
+SLOTS = 12 * 60 // SLOT_MINUTES
+SLOT_KEYS = ['Branch', 'Day_of_week', 'Slot', 'Product line']
+
+# Time bucket widths in minutes, where 240 gives the Morning, Afternoon and
+# Evening shifts of TIMES
+SHIFT_MINUTES = 240
+BUCKET_WIDTHS = [240, 120, 60, 30, 15]
+
+# Date ranges are answered from cumulative sums over the days with sales,
+# ordered by day of week first so that every day of week is one block
+DAILY_KEYS = ['Date', 'Branch', 'Time_of_day', 'Product line']
+WEEKDAY_STRIDE = 10 ** 6
+
+# Map the Altair shorthand used by the chart functions to the
+# pre-aggregated column holding the same metric
+METRICS = {
+    'sum(Total)': 'total_sales',
+    'count(Invoice ID)': 'customer_traffic',
+    'mean(Total)': 'transaction_size',
+    'mean(Rating)': 'customer_satisfaction',
+    'sum(Staff)': 'staff'
+}
+
+# (chart kind, metric, title) of the heat maps on the first tab
+HEAT_MAPS = [
+    ('total_sales', 'sum(Total)', 'Total Sales (MMK)'),
+    ('customer_traffic', 'count(Invoice ID)', 'Customer Traffic'),
+    ('transaction_size', 'mean(Total)', 'Average Transaction Size (MMK)'),
+    ('customer_satisfaction', 'mean(Rating)', 'Average Customer Satisfaction')
+]
+
+# (metric, title, y axis title) of the bar plots on the second tab
+BAR_PLOTS = [
+    ('sum(Total)', 'Total Sales', 'Sales in MMK'),
+    ('count(Invoice ID)', 'Customer Traffic', 'Transactions'),
+    ('mean(Total)', 'Average Transaction Size', 'Sales in MMK'),
+    ('mean(Rating)', 'Average Customer Satisfaction', 'Rating')
+]
+
+def get_branch_cities(df):
+    """
+    Find the city of every branch
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data, or a batch of it
+
+    Returns
+    -------
+    pandas Series
+        the city of every branch with sales, indexed by branch character
+    """
+    return df.groupby('Branch', observed=True, sort=True)['City'].first().astype(str)
+
+def make_branch_labels(cities):
+    """
+    Label every branch with its city, adding the branch character when a
+    city has several branches
+
+    Parameters
+    ----------
+    cities: pandas Series
+        the output of get_branch_cities
+
+    Returns
+    -------
+    dict
+        maps each branch character to its label
+    """
+    counts = cities.value_counts()
+    return {branch: city if counts[city] == 1 else '{} ({})'.format(city, branch)
+            for branch, city in cities.items()}
+
+def make_sums(df, keys, levels):
+    """
+    Sum sales, transactions and ratings for every combination of keys
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+    keys: list of str
+        the columns to group by
+    levels: list of list
+        the values of each key, used to fill in combinations without sales
+
+    Returns
+    -------
+    pandas DataFrame
+        additive sums indexed by every combination of keys
+    """
+    frame = df[keys + ['Total', 'Rating']].copy()
+    for key, values in zip(keys, levels):
+        frame[key] = pd.Categorical(frame[key], categories=values)
+
+    sums = (frame
+            .groupby(keys, observed=True)
+            .agg(total=('Total', 'sum'),
+                 count=('Total', 'size'),
+                 rating=('Rating', 'sum'))
+    )
+    index = pd.MultiIndex.from_product(levels, names=keys)
+    return sums.reindex(index, fill_value=0)
+
+def add_sums(sums, other):
+    """
+    Combine the sums of two batches of sales
+
+    Parameters
+    ----------
+    sums: pandas DataFrame
+        the output of make_sums, or None for an empty total
+    other: pandas DataFrame
+        the output of make_sums for another batch
+
+    Returns
+    -------
+    pandas DataFrame
+        sums over both batches, indexed by the union of their keys
+    """
+    if sums is None:
+        return other
+    return sums.add(other, fill_value=0)
+
+def make_metrics(sums):
+    """
+    Derive the dashboard metrics from additive sums
+
+    Parameters
+    ----------
+    sums: pandas DataFrame
+        the output of make_sums
+
+    Returns
+    -------
+    pandas DataFrame
+        total sales, customer traffic, average transaction size and
+        average customer satisfaction for every row of sums
+    """
+    metrics = pd.DataFrame(index=sums.index)
+    metrics['total_sales'] = sums['total'].astype(float)
+    metrics['customer_traffic'] = sums['count'].astype(int)
+    metrics['transaction_size'] = sums['total'] / sums['count'].where(sums['count'] > 0)
+    metrics['customer_satisfaction'] = sums['rating'] / sums['count'].where(sums['count'] > 0)
+    return metrics
+
+def make_cube(df):
+    """
+    Aggregate the sales onto every branch, day of week, time of day and
+    product line combination
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+
+    Returns
+    -------
+    pandas DataFrame
+        additive sums indexed by Branch, Day_of_week, Time_of_day and
+        Product line, including combinations without sales
+    """
+    branches = sorted(df['Branch'].unique())
+    products = sorted(df['Product line'].unique())
+    return make_sums(df, CUBE_KEYS, [branches, DAYS, TIMES, products])
+
+def make_batch_cube(df):
+    """
+    Aggregate a batch of sales onto the cube keys it contains
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        a batch of cleaned supermarket sales data
+
+    Returns
+    -------
+    pandas DataFrame
+        additive sums indexed by the Branch, Day_of_week, Time_of_day and
+        Product line combinations that have sales in the batch
+    """
+    levels = [sorted(df[key].dropna().unique()) for key in CUBE_KEYS]
+    sums = make_sums(df, CUBE_KEYS, levels)
+    return sums[sums['count'] > 0]
+
+def fill_cube(sums):
+    """
+    Fill in the cube keys without sales after combining batches
+
+    Parameters
+    ----------
+    sums: pandas DataFrame
+        additive sums indexed by some of the cube keys
+
+    Returns
+    -------
+    pandas DataFrame
+        additive sums indexed by every branch, day of week, time of day and
+        product line combination
+    """
+    branches = sorted(sums.index.unique(level='Branch'))
+    products = sorted(sums.index.unique(level='Product line'))
+    index = pd.MultiIndex.from_product([branches, DAYS, TIMES, products], names=CUBE_KEYS)
+    sums = sums.reindex(index, fill_value=0)
+    sums['count'] = sums['count'].astype(int)
+    return sums
+
+def make_heat_map_table(cube):
+    """
+    Roll the cube up onto the day of week by time of day grid
+
+    Parameters
+    ----------
+    cube: pandas DataFrame
+        the output of make_cube
+
+    Returns
+    -------
+    pandas DataFrame
+        heat map metrics indexed by Branch, Day_of_week and Time_of_day
+    """
+    sums = cube.groupby(level=[0, 1, 2], sort=False).sum()
+    return make_metrics(sums)
+
+def split_blocks(frame, keys, size):
+    """
+    Split a dense table into the consecutive blocks of rows of each key
+
+    The cube lists every combination of keys in the same order, so the rows
+    of a branch, or of a branch, day and time, are always next to each other
+    and can be sliced by position instead of filtered or grouped.
+
+    Parameters
+    ----------
+    frame: pandas DataFrame
+        the table to split
+    keys: sequence
+        the key of every row of frame
+    size: int
+        the number of rows of each key
+
+    Returns
+    -------
+    dict
+        maps each key to its block of rows, empty for an empty frame
+    """
+    if frame.empty:
+        return {}
+    return {keys[start]: frame.iloc[start:start + size].reset_index(drop=True)
+            for start in range(0, len(frame), size)}
+
+def make_heat_map_tables(table):
+    """
+    Slice the heat map grid into one table per branch
+
+    Parameters
+    ----------
+    table: pandas DataFrame
+        the output of make_heat_map_table, or the part of it for some
+        branches
+
+    Returns
+    -------
+    dict
+        maps each branch to the heat map metrics of every day of week and
+        time of day
+    """
+    keys = table.index.get_level_values('Branch')
+    return split_blocks(table.reset_index(level=0, drop=True).reset_index(),
+                        keys, len(DAYS) * len(table.index.unique(level='Time_of_day')))
+
+def make_comparison_cells(table, branches, func, delta=False):
+    """
+    Collect one heat map metric of several branches in a single table
+
+    Parameters
+    ----------
+    table: pandas DataFrame
+        the output of make_heat_map_table
+    branches: list of str
+        the characters used to represent the supermarket branches
+    func: str
+        the metric to compare, e.g. sum(Total)
+    delta: bool
+        subtract the average of every branch in the chain from each cell
+
+    Returns
+    -------
+    pandas DataFrame
+        one row per branch, day of week and time of day
+    """
+    values = table[METRICS[func]]
+    if delta:
+        chain_average = values.groupby(level=['Day_of_week', 'Time_of_day'], sort=False).transform('mean')
+        values = values - chain_average
+    return values.loc[branches].rename('value').reset_index()
+
+def make_bar_plot_tables(cube):
+    """
+    Slice the cube into one bar plot table per branch, day of week and
+    time of day
+
+    Parameters
+    ----------
+    cube: pandas DataFrame
+        the output of make_cube
+
+    Returns
+    -------
+    dict
+        maps (branch, day of week, time of day) to the metrics of every
+        product line
+    """
+    metrics = make_metrics(cube)
+    keys = metrics.index.droplevel('Product line')
+    return split_blocks(metrics.reset_index(level=[0, 1, 2], drop=True).reset_index(),
+                        keys, len(cube.index.unique(level='Product line')))
+
+def update_bar_plot_tables(tables, cube, keys):
+    """
+    Refresh the bar plot tables of the given keys only
+
+    Parameters
+    ----------
+    tables: dict
+        the output of make_bar_plot_tables, modified in place
+    cube: pandas DataFrame
+        the output of make_cube, after new sales were added
+    keys: list of tuple
+        the (branch, day of week, time of day) combinations that changed
+    """
+    if not keys:
+        return
+    # The cube is dense, so each key is a block of rows at a known position
+    # and is picked without searching its index
+    levels = [cube.index.unique(level=level) for level in CUBE_KEYS[:3]]
+    products = len(cube.index.unique(level='Product line'))
+    codes = [level.get_indexer([key[i] for key in keys]) for i, level in enumerate(levels)]
+    blocks = np.ravel_multi_index(codes, [len(level) for level in levels])
+    rows = (blocks[:, None] * products + np.arange(products)).ravel()
+
+    metrics = make_metrics(cube.iloc[rows])
+    tables.update(split_blocks(metrics.reset_index(level=[0, 1, 2], drop=True).reset_index(),
+                               metrics.index.droplevel('Product line'), products))
+
+def get_heat_map_cells(tables, branch_index):
+    """
+    Look up the 21 heat map cells of one branch
+
+    Parameters
+    ----------
+    tables: dict
+        the output of make_heat_map_tables
+    branch_index: str
+        the character used to represent the supermarket branch
+
+    Returns
+    -------
+    pandas DataFrame
+        one row per day of week and time of day
+    """
+    return tables[branch_index]
+
+def get_bar_plot_cells(tables, day_of_week, time_of_day, branch_index):
+    """
+    Look up the product line metrics of one branch, day and time
+
+    Parameters
+    ----------
+    tables: dict
+        the output of make_bar_plot_tables
+    day_of_week: str
+        the day of week ranging from Monday to Sunday
+    time_of_day: str
+        the time of day (Morning, Afternoon or Evening)
+    branch_index: str
+        the character used to represent the supermarket branch
+
+    Returns
+    -------
+    pandas DataFrame
+        one row per product line
+    """
+    return tables[(branch_index, day_of_week, time_of_day)]
+
+def get_minute_of_day(df):
+    """
+    Get the minutes since midnight of every transaction
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+
+    Returns
+    -------
+    numpy array
+        the Minute_of_day column, or the same values derived from Date_time
+        for data cleaned before the column existed
+    """
+    if 'Minute_of_day' in df:
+        return df['Minute_of_day'].values
+    date_time = df['Date_time'].dt
+    return (date_time.hour * 60 + date_time.minute).values.astype('int16')
+
+def make_slot_cube(df, branches, products):
+    """
+    Aggregate the sales onto every branch, day of week, 15 minute slot and
+    product line combination
+
+    Every transaction is given the position of its combination in the dense
+    cube, so the sums are three np.bincount calls over integer codes.
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+    branches: list of str
+        the branches of the cube, sales of other branches are ignored
+    products: list of str
+        the product lines of the cube
+
+    Returns
+    -------
+    pandas DataFrame
+        additive sums indexed by Branch, Day_of_week, Slot and Product line
+        in sorted order, including combinations without sales
+    """
+    slot = (get_minute_of_day(df).astype(np.int64) - FIRST_MINUTE) // SLOT_MINUTES
+    codes = [pd.Categorical(df['Branch'], categories=branches).codes,
+             pd.Categorical(df['Day_of_week'], categories=DAYS).codes,
+             slot,
+             pd.Categorical(df['Product line'], categories=products).codes]
+    shape = (len(branches), len(DAYS), SLOTS, len(products))
+    inside = np.all([(code >= 0) & (code < size) for code, size in zip(codes, shape)], axis=0)
+    position = np.ravel_multi_index([code[inside] for code in codes], shape)
+
+    size = int(np.prod(shape))
+    index = pd.MultiIndex.from_product([branches, DAYS, range(SLOTS), products], names=SLOT_KEYS)
+    return pd.DataFrame({
+        'total': np.bincount(position, weights=df['Total'].values[inside], minlength=size),
+        'count': np.bincount(position, minlength=size),
+        'rating': np.bincount(position, weights=df['Rating'].values[inside], minlength=size)
+    }, index=index)
+
+def get_time_buckets(width):
+    """
+    Label the time buckets of a width
+
+    Parameters
+    ----------
+    width: int
+        the bucket width in minutes, one of BUCKET_WIDTHS
+
+    Returns
+    -------
+    list of str
+        TIMES for the shifts, or the start of every bucket such as 09:15
+    """
+    if width == SHIFT_MINUTES:
+        return TIMES
+    return ['{:02d}:{:02d}'.format(minute // 60, minute % 60)
+            for minute in range(FIRST_MINUTE, FIRST_MINUTE + SLOTS * SLOT_MINUTES, width)]
+
+def rebin_cube(slot_cube, width):
+    """
+    Sum the 15 minute slots into time buckets of another width
+
+    The slots of a bucket are next to each other in the dense cube, so this
+    is a reshape and a sum whose cost does not depend on the number of
+    transactions.
+
+    Parameters
+    ----------
+    slot_cube: pandas DataFrame
+        the output of make_slot_cube
+    width: int
+        the bucket width in minutes, one of BUCKET_WIDTHS
+
+    Returns
+    -------
+    pandas DataFrame
+        additive sums indexed like the output of make_cube, with the bucket
+        labels of get_time_buckets as Time_of_day
+    """
+    branches = slot_cube.index.unique(level='Branch')
+    products = slot_cube.index.unique(level='Product line')
+    per_bucket = width // SLOT_MINUTES
+    columns = ['total', 'count', 'rating']
+    values = (slot_cube[columns].values
+              .reshape(len(branches), len(DAYS), SLOTS // per_bucket, per_bucket, len(products), len(columns))
+              .sum(axis=3))
+
+    index = pd.MultiIndex.from_product([list(branches), DAYS, get_time_buckets(width), list(products)],
+                                       names=CUBE_KEYS)
+    sums = pd.DataFrame(values.reshape(-1, len(columns)), index=index, columns=columns)
+    sums['count'] = sums['count'].astype(int)
+    return sums
+
+def get_day_numbers(dates):
+    """
+    Count the days since 1970-01-01 of every date
+
+    Parameters
+    ----------
+    dates: DatetimeIndex or array of datetime64
+        the dates
+
+    Returns
+    -------
+    numpy array
+        the day numbers as integers
+    """
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+def make_daily_sums(df, branches, products, dates=None):
+    """
+    Aggregate the sales onto every date, branch, time of day and product
+    line combination
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+    branches: list of str
+        the branches of the cube
+    products: list of str
+        the product lines of the cube
+    dates: DatetimeIndex
+        the dates to include, by default the dates of df
+
+    Returns
+    -------
+    pandas DataFrame
+        additive sums indexed by Date, Branch, Time_of_day and Product line,
+        including combinations without sales
+    """
+    frame = df[['Branch', 'Time_of_day', 'Product line', 'Total', 'Rating']].copy()
+    frame['Date'] = df['Date_time'].dt.normalize()
+    if dates is None:
+        dates = pd.DatetimeIndex(frame['Date'].unique()).sort_values()
+    return make_sums(frame, DAILY_KEYS, [dates, branches, TIMES, products])
+
+def extend_daily_sums(daily, batch):
+    """
+    Add the daily sums of a batch of sales with the same branches and
+    product lines
+
+    Only the rows of the batch dates are visited, new dates are appended
+    after the others.
+
+    Parameters
+    ----------
+    daily: pandas DataFrame
+        the output of make_daily_sums
+    batch: pandas DataFrame
+        the output of make_daily_sums for the batch, with the same branches
+        and product lines
+
+    Returns
+    -------
+    pandas DataFrame
+        the daily sums of both, indexed by the union of their dates
+    """
+    dates = daily.index.unique(level='Date')
+    batch_dates = batch.index.unique(level='Date')
+    block = np.arange(len(daily) // len(dates))
+    known = batch_dates.isin(dates)
+
+    rows = (dates.get_indexer(batch_dates[known])[:, None] * len(block) + block).ravel()
+    batch_rows = (np.flatnonzero(known)[:, None] * len(block) + block).ravel()
+    columns = {}
+    for column in daily.columns:
+        values = daily[column].values.copy()
+        values[rows] += batch[column].values[batch_rows]
+        columns[column] = values
+    extended = pd.DataFrame(columns, index=daily.index)
+    if known.all():
+        return extended
+
+    new_rows = (np.flatnonzero(~known)[:, None] * len(block) + block).ravel()
+    extended = pd.concat([extended, batch.iloc[new_rows]])
+    if batch_dates[~known].min() < dates.max():
+        # Sales of a past date that had none, put the dates back in order
+        extended = extended.reindex(pd.MultiIndex.from_product(
+            [dates.union(batch_dates)] + [daily.index.unique(level=key) for key in DAILY_KEYS[1:]],
+            names=DAILY_KEYS))
+    return extended
+
+def make_prefix_sums(daily):
+    """
+    Accumulate the daily sums in order of day of week and date
+
+    Parameters
+    ----------
+    daily: pandas DataFrame
+        the output of make_daily_sums
+
+    Returns
+    -------
+    dict
+        the sorted keys of the dates, their cumulative sums starting from
+        zero, and the branches and product lines of the sums
+    """
+    dates = daily.index.unique(level='Date')
+    branches = daily.index.unique(level='Branch')
+    products = daily.index.unique(level='Product line')
+    values = daily[['total', 'count', 'rating']].values.reshape(len(dates), -1)
+
+    keys = dates.dayofweek.values.astype(np.int64) * WEEKDAY_STRIDE + get_day_numbers(dates)
+    order = np.argsort(keys, kind='stable')
+    sums = np.zeros((len(dates) + 1, values.shape[1]))
+    np.cumsum(values[order], axis=0, out=sums[1:])
+    return {'keys': keys[order], 'sums': sums, 'branches': list(branches), 'products': list(products)}
+
+def query_prefix_sums(prefix, start, end):
+    """
+    Sum the sales between two dates without visiting the transactions
+
+    Each day of week is a block of the sorted keys, so the first and last
+    date of the range in all seven blocks are two vectorized binary searches
+    and the sums are one subtraction of cumulative sums.
+
+    Parameters
+    ----------
+    prefix: dict
+        the output of make_prefix_sums
+    start: str
+        the first date of the range, e.g. 2019-01-01
+    end: str
+        the last date of the range, included
+
+    Returns
+    -------
+    pandas DataFrame
+        additive sums indexed like the output of make_cube
+    """
+    weekdays = np.arange(len(DAYS), dtype=np.int64) * WEEKDAY_STRIDE
+    first, last = get_day_numbers(pd.to_datetime([start, end]))
+    starts = np.searchsorted(prefix['keys'], weekdays + first, side='left')
+    ends = np.searchsorted(prefix['keys'], weekdays + last, side='right')
+    sums = prefix['sums'][ends] - prefix['sums'][starts]
+
+    branches, products = prefix['branches'], prefix['products']
+    # Move the day of week after the branch, like the cube keys
+    values = (sums
+              .reshape(len(DAYS), len(branches), len(TIMES), len(products), 3)
+              .transpose(1, 0, 2, 3, 4)
+              .reshape(-1, 3))
+    index = pd.MultiIndex.from_product([branches, DAYS, TIMES, products], names=CUBE_KEYS)
+    cube = pd.DataFrame(values, index=index, columns=['total', 'count', 'rating'])
+    cube['count'] = cube['count'].round().astype(int)
+    return cube
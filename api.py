@@ -0,0 +1,226 @@
+"""
+Serve the aggregated sales to other systems over HTTP
+
+GET /api/aggregates returns the additive sums and the dashboard metrics of
+every branch, day of week, time of day and product line, the same cube the
+charts are drawn from. Query parameters narrow it down:
+
+- branch, day_of_week, time_of_day and product_line keep only the given
+  values, repeated or comma separated
+- start and end sum the sales between two dates, e.g. 2019-01-01
+- by rolls the cube up to some of its keys, e.g. by=Branch,Time_of_day
+- format=arrow returns an Arrow IPC stream instead of JSON, which needs
+  pyarrow
+
+Responses carry an ETag derived from the data and a Last-Modified time, so
+that clients polling with If-None-Match or If-Modified-Since get an empty
+304 until new sales arrive, and are gzipped for clients that accept it.
+Only the ETag is the same in every worker, Last-Modified is the time the
+worker answering published the data.
+"""
+import datetime
+import gzip
+import hashlib
+
+import pandas as pd
+from flask import jsonify, request, Response
+from werkzeug.http import is_resource_modified
+
+import aggregate
+import instrument
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Query parameter of every cube key
+FILTERS = {
+    'branch': 'Branch',
+    'day_of_week': 'Day_of_week',
+    'time_of_day': 'Time_of_day',
+    'product_line': 'Product line'
+}
+
+JSON_TYPE = 'application/json'
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+
+_data = None
+
+def get_version(cube):
+    """
+    Fingerprint the sums of a cube
+
+    Parameters
+    ----------
+    cube: pandas DataFrame
+        the output of aggregate.make_cube
+
+    Returns
+    -------
+    str
+        a hash that only changes with the sums, the same in every worker
+    """
+    return hashlib.sha1(pd.util.hash_pandas_object(cube).values.tobytes()).hexdigest()
+
+def publish(cube, prefix_sums, first_date, last_date):
+    """
+    Serve new aggregates, e.g. after a data refresh
+
+    Parameters
+    ----------
+    cube: pandas DataFrame
+        the output of aggregate.make_cube
+    prefix_sums: dict
+        the output of aggregate.make_prefix_sums for the same sales
+    first_date: pandas Timestamp
+        the first date with sales
+    last_date: pandas Timestamp
+        the last date with sales
+    """
+    global _data
+
+    version = get_version(cube)
+    if _data is not None and _data['version'] == version:
+        modified = _data['modified']
+    else:
+        # Differs between workers, which is why clients should poll by ETag
+        modified = datetime.datetime.utcnow().replace(microsecond=0)
+    # Swap the whole dict so that a request never mixes two refreshes
+    _data = {'cube': cube, 'prefix_sums': prefix_sums, 'first_date': first_date,
+             'last_date': last_date, 'version': version, 'modified': modified}
+
+def get_values(args, name):
+    """
+    Read a query parameter given repeated or comma separated
+
+    Parameters
+    ----------
+    args: werkzeug MultiDict
+        the query parameters
+    name: str
+        the name of the parameter
+
+    Returns
+    -------
+    list of str
+        every value of the parameter
+    """
+    return [value for values in args.getlist(name) for value in values.split(',') if value]
+
+def get_sums(data, args):
+    """
+    Select the sums a query asks for
+
+    Parameters
+    ----------
+    data: dict
+        the aggregates last published
+    args: werkzeug MultiDict
+        the query parameters
+
+    Returns
+    -------
+    pandas DataFrame
+        additive sums indexed by the cube keys asked for
+    """
+    start, end = args.get('start'), args.get('end')
+    if start is None and end is None:
+        sums = data['cube']
+    else:
+        start = pd.Timestamp(start or data['first_date'])
+        end = pd.Timestamp(end or data['last_date'])
+        if start > end:
+            raise ValueError('start must not be after end')
+        sums = aggregate.query_prefix_sums(data['prefix_sums'], start, end)
+
+    for name, key in FILTERS.items():
+        values = get_values(args, name)
+        if values:
+            sums = sums[sums.index.get_level_values(key).isin(values)]
+
+    by = get_values(args, 'by')
+    if by:
+        sums = sums.groupby(level=by, sort=False).sum()
+    return sums
+
+def to_body(sums, fmt):
+    """
+    Serialize the sums and their metrics
+
+    Parameters
+    ----------
+    sums: pandas DataFrame
+        the output of get_sums
+    fmt: str
+        json or arrow
+
+    Returns
+    -------
+    bytes
+        the response body
+    """
+    table = sums.join(aggregate.make_metrics(sums)).reset_index()
+    if fmt == 'json':
+        return table.to_json(orient='split', index=False).encode()
+
+    sink = pa.BufferOutputStream()
+    arrow_table = pa.Table.from_pandas(table, preserve_index=False)
+    writer = pa.RecordBatchStreamWriter(sink, arrow_table.schema)
+    writer.write_table(arrow_table)
+    writer.close()
+    return sink.getvalue().to_pybytes()
+
+def get_aggregates():
+    """
+    Answer GET /api/aggregates, see the module docstring
+
+    Returns
+    -------
+    flask Response
+        the sums and metrics, a 304 when the client has them already or a
+        400 for an invalid query
+    """
+    data = _data
+    args = request.args
+    fmt = args.get('format') or ('arrow' if request.accept_mimetypes.best == ARROW_TYPE else 'json')
+    if fmt not in ('json', 'arrow'):
+        return jsonify(error='format must be json or arrow'), 400
+    if fmt == 'arrow' and pa is None:
+        return jsonify(error='arrow needs pyarrow installed on the server'), 406
+    unknown = set(get_values(args, 'by')) - set(aggregate.CUBE_KEYS)
+    if unknown:
+        return jsonify(error='by must be among {}'.format(', '.join(aggregate.CUBE_KEYS))), 400
+
+    # Each representation of each query of each version gets its own tag
+    encoding = 'gzip' if request.accept_encodings['gzip'] > 0 else None
+    query = sorted(args.items(multi=True))
+    etag = hashlib.sha1(repr((data['version'], query, fmt, encoding)).encode()).hexdigest()
+    headers = {'ETag': '"{}"'.format(etag),
+               'Last-Modified': data['modified'].strftime('%a, %d %b %Y %H:%M:%S GMT'),
+               'Cache-Control': 'no-cache',
+               'Vary': 'Accept, Accept-Encoding'}
+    if not is_resource_modified(request.environ, etag=etag, last_modified=data['modified']):
+        return Response(status=304, headers=headers)
+
+    try:
+        with instrument.timed('api:aggregates'):
+            body = to_body(get_sums(data, args), fmt)
+    except ValueError as error:
+        # e.g. a date pandas cannot parse or a start after the end
+        return jsonify(error=str(error)), 400
+    if encoding is not None:
+        body = gzip.compress(body)
+        headers['Content-Encoding'] = encoding
+    return Response(body, headers=headers, mimetype=JSON_TYPE if fmt == 'json' else ARROW_TYPE)
+
+def init_app(server):
+    """
+    Serve the aggregates of a Flask server at /api/aggregates
+
+    Parameters
+    ----------
+    server: Flask app
+        the server of the Dash app
+    """
+    server.add_url_rule('/api/aggregates', 'api_aggregates', get_aggregates, methods=['GET'])
@@ -1,22 +1,337 @@
+# Charts are rendered by the callbacks on first load, so startup should
+# only pay for the imports and for reading and aggregating the data
+import time
+start_time = time.perf_counter()
+
 import dash
 import dash_core_components as dcc
 import dash_bootstrap_components as dbc
 import dash_html_components as html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, ClientsideFunction
+from dash.exceptions import PreventUpdate
 import altair as alt
 import pandas as pd
+import functools
+import os
+import logging
+import threading
+
+STARTUP_BUDGET = float(os.environ.get('STARTUP_BUDGET', '2.0'))
+
+import aggregate
+import api
+import chart_cache
+import datastore
+import figures
+import forecast
+import ingest
+import instrument
+import prerender
+import render_pool
+import schedule
 
 app = dash.Dash(__name__, assets_folder='assets')
 app.config['suppress_callback_exceptions'] = True
 
 server = app.server
+instrument.init_app(server)
+api.init_app(server)
 app.title = 'Supermarket team scheduling dashboard'
 
+# Set SHARED_HEAT_MAPS=1 to draw the four heat maps from one shared dataset
+SHARED_HEAT_MAPS = os.environ.get('SHARED_HEAT_MAPS') == '1'
+
+# Set CLIENTSIDE_CHARTS=1 to send the bar plots of a store to the browser
+# once and redraw them there when the day or time of day changes
+CLIENTSIDE_CHARTS = os.environ.get('CLIENTSIDE_CHARTS') == '1'
+
+# Set NATIVE_CHARTS=1 to draw plotly figures in dcc.Graph instead of
+# Altair charts in iframes, which makes SHARED_HEAT_MAPS unnecessary
+NATIVE_CHARTS = os.environ.get('NATIVE_CHARTS') == '1' or CLIENTSIDE_CHARTS
+SHARED_HEAT_MAPS = SHARED_HEAT_MAPS and not NATIVE_CHARTS
+CHART_PROPERTY = 'figure' if NATIVE_CHARTS else 'srcDoc'
+
 # Import cleaned data
 # To run from `src` directory keep code below
 # To run from home directory, change path to '/data/supermarket_sales.csv'
 
-df = pd.read_csv('data/supermarket_sales_clean.csv')
+DATA_PATH = datastore.CSV_PATH
+df = datastore.load(DATA_PATH)
+
+# Serve charts written by prerender.py when they match the data
+prerendered = prerender.load_manifest(DATA_PATH)
+
+# Pre-aggregate and slice by branch once so that every chart of a store
+# shares the same cells instead of filtering the data again
+cube = aggregate.make_cube(df)
+heat_map_table = aggregate.make_heat_map_table(cube)
+heat_map_tables = aggregate.make_heat_map_tables(heat_map_table)
+bar_plot_tables = aggregate.make_bar_plot_tables(cube)
+
+# Sum every 15 minute slot once so that finer time buckets only need
+# aggregate.rebin_cube, and keep the tables of each width once asked for
+slot_cube = aggregate.make_slot_cube(df, list(cube.index.unique(level='Branch')),
+                                     list(cube.index.unique(level='Product line')))
+bucket_tables = {}
+bucket_bar_plot_tables = {}
+
+# Accumulate the sales day by day so that any date range is answered from
+# two rows of cumulative sums, see aggregate.query_prefix_sums
+daily_sums = aggregate.make_daily_sums(df, list(cube.index.unique(level='Branch')),
+                                       list(cube.index.unique(level='Product line')))
+prefix_sums = aggregate.make_prefix_sums(daily_sums)
+first_date = daily_sums.index.unique(level='Date').min()
+last_date = daily_sums.index.unique(level='Date').max()
+api.publish(cube, prefix_sums, first_date, last_date)
+
+# Fit the staffing forecast of every branch, which takes milliseconds
+FORECAST_WEEKS = 4
+forecast_model = forecast.fit(forecast.make_weekly_series(daily_sums))
+
+# Recommend a roster from the weekly averages of every cube cell, starting
+# from the last roster so that only branches with new sales are solved again
+roster_inputs = schedule.make_inputs(cube, len(daily_sums.index.unique(level='Date')) / len(aggregate.DAYS))
+roster = schedule.solve(roster_inputs)
+
+# Radio buttons suit a handful of stores, a searchable dropdown suits hundreds
+RADIO_MAX_STORES = 5
+branch_cities = aggregate.get_branch_cities(df)
+branch_labels = aggregate.make_branch_labels(branch_cities)
+store_options = [{'label': label, 'value': branch} for branch, label in branch_labels.items()]
+
+# Every chart reads the aggregates, so the transactions are not kept
+del df
+
+def get_date_range(start_date, end_date):
+    """
+    Turn the dates of the date picker into a range of the data
+
+    Parameters
+    ----------
+    start_date: str
+        the first date picked, e.g. 2019-01-01
+    end_date: str
+        the last date picked
+
+    Returns
+    -------
+    tuple or None
+        the first and last date as strings, or None when the picker is empty
+        or covers every date of the data, so that all sales are shown
+    """
+    start = pd.Timestamp(start_date or first_date).normalize()
+    end = pd.Timestamp(end_date or last_date).normalize()
+    if start <= first_date and end >= last_date:
+        return None
+    return start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')
+
+@functools.lru_cache(maxsize=32)
+def get_range_tables(dates):
+    """
+    Sum the sales of a date range onto the cube and the heat map grid
+
+    Parameters
+    ----------
+    dates: tuple
+        the first and last date of the range, from get_date_range
+
+    Returns
+    -------
+    tuple
+        the cube, the heat map table and the heat map tables of every
+        branch over the range
+    """
+    with instrument.timed('query_prefix_sums'):
+        range_cube = aggregate.query_prefix_sums(prefix_sums, *dates)
+        table = aggregate.make_heat_map_table(range_cube)
+        return range_cube, table, aggregate.make_heat_map_tables(table)
+
+@functools.lru_cache(maxsize=64)
+def get_range_bar_plot_tables(branch_index, dates):
+    """
+    Slice the bar plot tables of one branch over a date range
+
+    Parameters
+    ----------
+    branch_index: str
+        the character used to represent the supermarket branch
+    dates: tuple
+        the first and last date of the range, from get_date_range
+
+    Returns
+    -------
+    dict
+        maps (branch, day of week, time of day) to the metrics of every
+        product line
+    """
+    return aggregate.make_bar_plot_tables(get_range_tables(dates)[0].loc[[branch_index]])
+
+@functools.lru_cache(maxsize=FORECAST_WEEKS)
+def get_forecast_tables(weeks_ahead):
+    """
+    Forecast a week of every branch and slice it like the heat map tables
+
+    Parameters
+    ----------
+    weeks_ahead: int
+        1 for the week after the last sales, 2 for the one after and so on
+
+    Returns
+    -------
+    dict
+        maps each branch to the forecast traffic and sales of every day of
+        week and time of day
+    """
+    with instrument.timed('predict'):
+        return aggregate.make_heat_map_tables(forecast.predict(forecast_model, weeks_ahead))
+
+def get_heat_map_tables(width=aggregate.SHIFT_MINUTES, dates=None):
+    """
+    Get the heat map tables of every branch for a time bucket width
+
+    Parameters
+    ----------
+    width: int
+        the time bucket width in minutes, one of aggregate.BUCKET_WIDTHS
+    dates: tuple
+        the date range from get_date_range, only with shifts, or None
+
+    Returns
+    -------
+    dict
+        maps each branch to the heat map metrics of every day of week and
+        time bucket
+    """
+    if dates is not None:
+        return get_range_tables(dates)[2]
+    if width == aggregate.SHIFT_MINUTES:
+        return heat_map_tables
+    return get_bucket_tables(width)[1]
+
+def get_bucket_tables(width):
+    """
+    Re-aggregate the 15 minute slots into time buckets of a width once
+
+    Parameters
+    ----------
+    width: int
+        the time bucket width in minutes, one of aggregate.BUCKET_WIDTHS
+
+    Returns
+    -------
+    tuple
+        the cube and the heat map tables of the width
+    """
+    tables = bucket_tables.get(width)
+    if tables is None:
+        with instrument.timed('rebin:{}'.format(width)):
+            bucket_cube = aggregate.rebin_cube(slot_cube, width)
+            tables = (bucket_cube,
+                      aggregate.make_heat_map_tables(aggregate.make_heat_map_table(bucket_cube)))
+        bucket_tables[width] = tables
+    return tables
+
+def get_bar_plot_tables(branch_index, width=aggregate.SHIFT_MINUTES, dates=None):
+    """
+    Get the bar plot tables of a branch for a time bucket width
+
+    Parameters
+    ----------
+    branch_index: str
+        the character used to represent the supermarket branch
+    width: int
+        the time bucket width in minutes, one of aggregate.BUCKET_WIDTHS
+    dates: tuple
+        the date range from get_date_range, only with shifts, or None
+
+    Returns
+    -------
+    dict
+        maps (branch, day of week, time bucket) to the metrics of every
+        product line, for at least the given branch
+    """
+    if dates is not None:
+        return get_range_bar_plot_tables(branch_index, dates)
+    if width == aggregate.SHIFT_MINUTES:
+        return bar_plot_tables
+    tables = bucket_bar_plot_tables.get((width, branch_index))
+    if tables is None:
+        # Finer buckets have too many tables to slice every branch up front
+        bucket_cube = get_bucket_tables(width)[0]
+        tables = aggregate.make_bar_plot_tables(bucket_cube.loc[[branch_index]])
+        bucket_bar_plot_tables[(width, branch_index)] = tables
+    return tables
+
+def get_heat_map_height(times):
+    """
+    Size a heat map so that every time bucket stays readable
+
+    Parameters
+    ----------
+    times: list of str
+        the time buckets on the y axis
+
+    Returns
+    -------
+    int
+        the height of the heat map in pixels
+    """
+    return max(130, 6 * len(times))
+
+def make_heat_map_base(cells, func, plot_title):
+    """
+    Make an unconfigured heat map by day of week and time of day
+
+    Parameters
+    ----------
+    cells: pandas DataFrame
+        the heat map cells of one branch
+    func: str
+        the variable to be associated with alt.Color()
+    plot_title: str
+        the name to be used as title
+
+    Returns
+    -------
+    Altair chart object
+        a heat map that can still be concatenated
+    """
+    field = aggregate.METRICS[func]
+    # Shifts or finer time buckets, in the order of the cells
+    times = list(cells['Time_of_day'].unique())
+
+    heat_map = (alt
+                .Chart(cells)
+                .mark_rect()
+                .encode(alt.X('Day_of_week:N', title=None, sort=aggregate.DAYS),
+                        # Finer buckets have rows thinner than the labels, so
+                        # keep every other label until they no longer overlap
+                        alt.Y('Time_of_day:N', title=None, sort=times, axis=alt.Axis(labelOverlap='parity')),
+                        alt.Color(field, type = 'quantitative' ,title=None, scale=alt.Scale(scheme='greens')),
+                        tooltip=[alt.Tooltip(field, type='quantitative', title=plot_title, format=',.0f')])
+                .properties(width=180, height=get_heat_map_height(times), title=plot_title)
+    )
+    return heat_map
+
+def configure_heat_map(chart):
+    """
+    Apply the axis and title styling shared by all heat maps
+
+    Parameters
+    ----------
+    chart: Altair chart object
+        a heat map or concatenated heat maps
+
+    Returns
+    -------
+    Altair chart object
+        the configured chart
+    """
+    return (chart
+            .configure_axisX(labelAngle=45)
+            .configure_axis(labelFontSize=13, titleFontSize=13)
+            .configure_title(fontSize=14)
+    )
 
 def make_heat_map(branch_index, func, plot_title):
     
@@ -37,24 +352,29 @@ def make_heat_map(branch_index, func, plot_title):
     Altair chart object 
         a heat map 
     """
-    
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    times = ['Morning', 'Afternoon', 'Evening']
-    
-    heat_map = (alt
-                .Chart(df)
-                .mark_rect()
-                .encode(alt.X('Day_of_week:N', title=None, sort=days),
-                        alt.Y('Time_of_day:N', title=None, sort=times),
-                        alt.Color(func, type = 'quantitative' ,title=None, scale=alt.Scale(scheme='greens')),
-                        tooltip=[alt.Tooltip(func, type='quantitative', title=plot_title, format=',.0f')])
-                .configure_axisX(labelAngle=45)
-                .transform_filter(alt.FieldEqualPredicate(field='Branch', equal= branch_index))
-                .configure_axis(labelFontSize=13, titleFontSize=13)
-                .configure_title(fontSize=14)
-                .properties(width=180, height=130, title=plot_title)
-    )   
-    return heat_map
+    cells = aggregate.get_heat_map_cells(heat_map_tables, branch_index)
+
+    return make_configured_heat_map(cells, func, plot_title)
+
+def make_configured_heat_map(cells, func, plot_title):
+    """
+    Make a standalone heat map of the given cells
+
+    Parameters
+    ----------
+    cells: pandas DataFrame
+        the heat map cells of one branch
+    func: str
+        the variable to be associated with alt.Color()
+    plot_title: str
+        the name to be used as title
+
+    Returns
+    -------
+    Altair chart object
+        a configured heat map
+    """
+    return configure_heat_map(make_heat_map_base(cells, func, plot_title))
     
 def make_total_sales(branch_index='A'):
     """
@@ -131,6 +451,76 @@ def make_customer_satisfaction(branch_index='A'):
 
     return customer_satisfaction
 
+def concat_heat_maps(cells):
+    """
+    Concatenate all heat maps of the given cells
+
+    Parameters
+    ----------
+    cells: pandas DataFrame
+        the heat map cells of one branch
+
+    Returns
+    -------
+    Altair chart object
+        concatenated heat maps
+    """
+    heat_maps = [make_heat_map_base(cells, func, plot_title)
+                 for _, func, plot_title in aggregate.HEAT_MAPS]
+
+    return configure_heat_map(alt.concat(*heat_maps, columns=4)
+                              .resolve_scale(color='independent'))
+
+def make_store_comparison(branches, func, plot_title, delta=False, dates=None):
+    """
+    Make heat maps of one metric for several branches side by side
+
+    Parameters
+    ----------
+    branches: list of str
+        the characters used to represent the supermarket branches
+    func: str
+        the variable to be associated with alt.Color()
+    plot_title: str
+        the name to be used as title
+    delta: bool
+        show the difference from the chain average instead of the values
+    dates: tuple
+        the date range from get_date_range, or None for every date
+
+    Returns
+    -------
+    Altair chart object
+        faceted heat maps sharing one dataset and color scale
+    """
+    table = heat_map_table if dates is None else get_range_tables(dates)[1]
+    cells = aggregate.make_comparison_cells(table, branches, func, delta)
+    cells['Store'] = cells['Branch'].map(branch_labels)
+
+    if delta:
+        # Center the diverging scale on the chain average
+        limit = cells['value'].abs().max()
+        scale = alt.Scale(scheme='redblue', domain=[-limit, limit])
+        plot_title += ' vs Chain Average'
+    else:
+        scale = alt.Scale(scheme='greens')
+
+    comparison = (alt
+                  .Chart(cells)
+                  .mark_rect()
+                  .encode(alt.X('Day_of_week:N', title=None, sort=aggregate.DAYS),
+                          alt.Y('Time_of_day:N', title=None, sort=aggregate.TIMES),
+                          alt.Color('value', type='quantitative', title=None, scale=scale),
+                          tooltip=[alt.Tooltip('Store', title='Store'),
+                                   alt.Tooltip('value', type='quantitative', title=plot_title,
+                                               format=',.2f' if delta else ',.0f')])
+                  .properties(width=180, height=130)
+                  .facet(facet=alt.Facet('Store:N', title=None, sort=[branch_labels[b] for b in branches]),
+                         columns=4)
+                  .properties(title=plot_title)
+    )
+    return configure_heat_map(comparison)
+
 def make_bar_plot(day_of_week, time_of_day, branch_index, func, plot_title, y_title):
     '''
     Make a bar plot filtered by branch, day of week, and time of day 
@@ -154,16 +544,39 @@ def make_bar_plot(day_of_week, time_of_day, branch_index, func, plot_title, y_ti
         a bar plot 
 
     '''
+    cells = aggregate.get_bar_plot_cells(bar_plot_tables, day_of_week, time_of_day, branch_index)
+
+    return make_bar_plot_base(cells, func, plot_title, y_title)
+
+def make_bar_plot_base(cells, func, plot_title, y_title):
+    """
+    Make a bar plot by product line
+
+    Parameters
+    ----------
+    cells: pandas DataFrame
+        the bar plot cells of one branch, day of week and time of day
+    func: str
+        the variable to be used as y axis
+    plot_title: str
+        the name to be used as title
+    y_title: str
+        the title of the y axis
+
+    Returns
+    -------
+    Altair chart object
+        a bar plot
+    """
+    field = aggregate.METRICS[func]
+
     bar_plot = (alt
-                .Chart(df)
+                .Chart(cells)
                 .mark_bar(color = 'cornflowerblue')
                 .encode(alt.X('Product line:N', title=None),
-                        alt.Y(func, type='quantitative', title=y_title),
+                        alt.Y(field, type='quantitative', title=y_title),
                         tooltip=[alt.Tooltip('Product line', title='Product line'),
-                                alt.Tooltip(func, title=plot_title)])
-                .transform_filter(alt.FieldEqualPredicate(field='Branch', equal=branch_index))
-                .transform_filter(alt.FieldEqualPredicate(field='Day_of_week', equal=day_of_week))
-                .transform_filter(alt.FieldEqualPredicate(field='Time_of_day', equal=time_of_day))
+                                alt.Tooltip(field, type='quantitative', title=plot_title)])
                 .properties(width=250, height=175, title= plot_title)
     )
     return bar_plot
@@ -186,276 +599,1312 @@ def con_plt(day_of_week='Monday', time_of_day='Morning', branch_index='A'):
     Altair chart object
         concatenated bar plots
     """
-    bar_plot_sales = make_bar_plot(day_of_week, time_of_day, branch_index, 'sum(Total)', 'Total Sales', 'Sales in MMK')
-    bar_plot_traffic = make_bar_plot(day_of_week,time_of_day, branch_index, 'count(Invoice ID)', 'Customer Traffic', 'Transactions')
-    bar_plot_trans = make_bar_plot(day_of_week, time_of_day, branch_index, 'mean(Total)', 'Average Transaction Size', 'Sales in MMK')
-    bar_plot_rating = make_bar_plot(day_of_week, time_of_day, branch_index, 'mean(Rating)', 'Average Customer Satisfaction', 'Rating')
-    
+    cells = aggregate.get_bar_plot_cells(bar_plot_tables, day_of_week, time_of_day, branch_index)
+
+    return concat_bar_plots(cells)
+
+def concat_bar_plots(cells):
+    """
+    Concatenate all bar plots of the given cells
+
+    Parameters
+    ----------
+    cells: pandas DataFrame
+        the bar plot cells of one branch, day of week and time of day
+
+    Returns
+    -------
+    Altair chart object
+        concatenated bar plots
+    """
+    bar_plot_sales = make_bar_plot_base(cells, 'sum(Total)', 'Total Sales', 'Sales in MMK')
+    bar_plot_traffic = make_bar_plot_base(cells, 'count(Invoice ID)', 'Customer Traffic', 'Transactions')
+    bar_plot_trans = make_bar_plot_base(cells, 'mean(Total)', 'Average Transaction Size', 'Sales in MMK')
+    bar_plot_rating = make_bar_plot_base(cells, 'mean(Rating)', 'Average Customer Satisfaction', 'Rating')
+
     return (alt.concat(bar_plot_sales, bar_plot_traffic, bar_plot_trans, bar_plot_rating, columns=4)
                 .configure_axis(labelFontSize=13, titleFontSize=13)
                 .configure_title(fontSize=14)
                 .configure_axisX(labelAngle=45)
             )
 
-app.layout = html.Div([
-    html.Div([ 
-        html.H1(
-            children = 'Supermarket Staffing',
-            style = dict(textAlign = 'center')),
-
-        html.P(
-            children = 'Review historical sales of supermarkets in Myanmar in order to improve staffing by day of week, time of day and/or department.',
-            style = dict(textAlign = 'left')),
-
-        dcc.Markdown('''
-                    Attribution: the dataset used to create this dashboard can be found [here](https://www.kaggle.com/aungpyaeap/supermarket-sales).
-                    It contains historical sales of a supermarket chain in Myanmar across three branches over the course of three months.
-                    '''),
-
-        html.Label('Select store:'),
-
-        # Arrange radio buttoms to select branch
-        dcc.RadioItems(
-            id='Store',
-            options=[
-                {'label': 'Yangon', 'value': 'A'},
-                {'label': 'Mandalay', 'value': 'B'},
-                {'label': 'Naypyitaw', 'value': 'C'}
-            ],
-            value='A'),
-    ], style = {'backgroundColor': 'gainsboro'}),
+def get_chart_job(kind, branch_index='A', day_of_week=None, time_of_day=None,
+                  width=aggregate.SHIFT_MINUTES, dates=None):
+    """
+    Get the cells of a chart and the function building it from them
+
+    Parameters
+    ----------
+    kind: str
+        the kind used in chart cache keys, e.g. total_sales or bar_plots
+    branch_index: str
+        the character used to represent the supermarket branch
+    day_of_week: str
+        the day of week, only used by the bar plots
+    time_of_day: str
+        the time of day, only used by the bar plots
+    width: int
+        the time bucket width in minutes, one of aggregate.BUCKET_WIDTHS
+    dates: tuple
+        the date range from get_date_range, only with shifts, or None
+
+    Returns
+    -------
+    tuple
+        a module level chart function and its arguments, which can be sent
+        to another process
+    """
+    if kind == 'bar_plots':
+        cells = aggregate.get_bar_plot_cells(get_bar_plot_tables(branch_index, width, dates),
+                                             day_of_week, time_of_day, branch_index)
+        return concat_bar_plots, (cells,)
+
+    cells = aggregate.get_heat_map_cells(get_heat_map_tables(width, dates), branch_index)
+    if kind == 'heat_maps':
+        return concat_heat_maps, (cells,)
+
+    func, plot_title = [(func, plot_title) for heat_map_kind, func, plot_title in aggregate.HEAT_MAPS
+                        if heat_map_kind == kind][0]
+    return make_configured_heat_map, (cells, func, plot_title)
+
+def get_chart_html(kind, branch_index='A', day_of_week=None, time_of_day=None,
+                   width=aggregate.SHIFT_MINUTES, dates=None):
+    """
+    Get a chart in html format, reusing the cached copy when possible
+
+    Parameters
+    ----------
+    kind: str
+        the kind used in chart cache keys, e.g. total_sales or bar_plots
+    branch_index: str
+        the character used to represent the supermarket branch
+    day_of_week: str
+        the day of week, only used by the bar plots
+    time_of_day: str
+        the time of day, only used by the bar plots
+    width: int
+        the time bucket width in minutes, one of aggregate.BUCKET_WIDTHS
+    dates: tuple
+        the date range from get_date_range, only with shifts, or None
+
+    Returns
+    -------
+    str
+        the chart in html format
+    """
+    # Date ranges are too many to cache and cheap to sum, so render directly
+    if dates is not None:
+        build, args = get_chart_job(kind, branch_index, day_of_week, time_of_day, width, dates)
+        with instrument.timed('render_range:' + kind):
+            return render_pool.render_html(build, args)
+
+    # Only charts of finer time buckets add the width to their cache key
+    key = (kind, branch_index, day_of_week, time_of_day)
+    if width != aggregate.SHIFT_MINUTES:
+        key += (width,)
+
+    def render():
+        instrument.count('cache_miss:' + kind)
+        with instrument.timed('read_prerendered:' + kind):
+            html = prerender.read_html(prerendered, key) if len(key) == 4 else None
+        if html is not None:
+            return html
+        build, args = get_chart_job(kind, branch_index, day_of_week, time_of_day, width)
+        if render_pool.ENABLED:
+            with instrument.timed('render_pool:' + kind):
+                return render_pool.render_html(build, args)
+        with instrument.timed('build:' + kind):
+            chart = build(*args)
+        # Altair validates the chart against the Vega-Lite schema here
+        with instrument.timed('to_html:' + kind):
+            return chart.to_html()
+
+    return chart_cache.get_html(key, render)
+
+def get_chart(kind, branch_index='A', day_of_week=None, time_of_day=None,
+              width=aggregate.SHIFT_MINUTES, dates=None):
+    """
+    Get a chart in the format drawn by its component in the layout
+
+    Parameters
+    ----------
+    kind: str
+        the kind used in chart cache keys, e.g. total_sales or bar_plots
+    branch_index: str
+        the character used to represent the supermarket branch
+    day_of_week: str
+        the day of week, only used by the bar plots
+    time_of_day: str
+        the time of day, only used by the bar plots
+    width: int
+        the time bucket width in minutes, one of aggregate.BUCKET_WIDTHS
+    dates: tuple
+        the date range from get_date_range, only with shifts, or None
+
+    Returns
+    -------
+    str or plotly Figure
+        the chart in html format, or as a figure if NATIVE_CHARTS is set
+    """
+    if not NATIVE_CHARTS:
+        return get_chart_html(kind, branch_index, day_of_week, time_of_day, width, dates)
+
+    with instrument.timed('build_figure:' + kind):
+        if kind == 'bar_plots':
+            cells = aggregate.get_bar_plot_cells(get_bar_plot_tables(branch_index, width, dates),
+                                                 day_of_week, time_of_day, branch_index)
+            return figures.make_bar_plots_figure(cells)
+
+        cells = aggregate.get_heat_map_cells(get_heat_map_tables(width, dates), branch_index)
+        func, plot_title = [(func, plot_title) for heat_map_kind, func, plot_title in aggregate.HEAT_MAPS
+                            if heat_map_kind == kind][0]
+        return figures.make_heat_map_figure(cells, func, plot_title)
+
+def get_store_comparison(branches, kind, delta=False, dates=None):
+    """
+    Get the store comparison in the format drawn by its component
+
+    Parameters
+    ----------
+    branches: list of str
+        the characters used to represent the supermarket branches
+    kind: str
+        the kind of heat map to compare, e.g. total_sales
+    delta: bool
+        show the difference from the chain average instead of the values
+    dates: tuple
+        the date range from get_date_range, or None for every date
+
+    Returns
+    -------
+    str or plotly Figure
+        the heat maps in html format, or as a figure if NATIVE_CHARTS is set
+    """
+    func, plot_title = [(func, plot_title) for heat_map_kind, func, plot_title in aggregate.HEAT_MAPS
+                        if heat_map_kind == kind][0]
+
+    if NATIVE_CHARTS:
+        with instrument.timed('build_figure:store_comparison'):
+            table = heat_map_table if dates is None else get_range_tables(dates)[1]
+            cells = aggregate.make_comparison_cells(table, branches, func, delta)
+            return figures.make_store_comparison_figure(cells, [branch_labels[b] for b in branches],
+                                                        plot_title, delta)
+
+    with instrument.timed('build:store_comparison'):
+        chart = make_store_comparison(branches, func, plot_title, delta, dates)
+    with instrument.timed('to_html:store_comparison'):
+        return chart.to_html()
+
+def get_forecast_chart(branch_index, weeks_ahead, func, plot_title):
+    """
+    Get a forecast heat map in the format drawn by its component
+
+    Parameters
+    ----------
+    branch_index: str
+        the character used to represent the supermarket branch
+    weeks_ahead: int
+        1 for the week after the last sales, 2 for the one after and so on
+    func: str
+        the variable to be associated with the color
+    plot_title: str
+        the name to be used as title
+
+    Returns
+    -------
+    str or plotly Figure
+        the heat map in html format, or as a figure if NATIVE_CHARTS is set
+    """
+    cells = aggregate.get_heat_map_cells(get_forecast_tables(weeks_ahead), branch_index)
+    if NATIVE_CHARTS:
+        with instrument.timed('build_figure:forecast'):
+            return figures.make_heat_map_figure(cells, func, plot_title)
+    with instrument.timed('render:forecast'):
+        return render_pool.render_html(make_configured_heat_map, (cells, func, plot_title))
+
+def get_roster(max_staff, budget, staff_cost, customers_per_staff):
+    """
+    Solve the roster of every branch, starting from the last one
+
+    Parameters
+    ----------
+    max_staff: int
+        the most staff on the floor of a branch at once
+    budget: float
+        the weekly labour budget of every branch
+    staff_cost: float
+        the labour cost of one staff shift
+    customers_per_staff: float
+        the customers one staff member serves in a department over a shift
+
+    Returns
+    -------
+    dict
+        the output of schedule.solve
+    """
+    global roster
+
+    with instrument.timed('solve_roster'):
+        roster = schedule.solve(roster_inputs, roster, max_staff=max_staff, budget=budget,
+                                staff_cost=staff_cost, customers_per_staff=customers_per_staff)
+    return roster
+
+def get_roster_chart(staff):
+    """
+    Get the heat map of the staff of one branch per day of week and time of day
+
+    Parameters
+    ----------
+    staff: numpy array
+        the staff of the branch by day of week, time of day and product line
+
+    Returns
+    -------
+    str or plotly Figure
+        the heat map in html format, or as a figure if NATIVE_CHARTS is set
+    """
+    cells = pd.DataFrame({'Day_of_week': [day for day in aggregate.DAYS for _ in aggregate.TIMES],
+                          'Time_of_day': aggregate.TIMES * len(aggregate.DAYS),
+                          'staff': staff.sum(axis=2).ravel()})
+    if NATIVE_CHARTS:
+        with instrument.timed('build_figure:roster'):
+            return figures.make_heat_map_figure(cells, 'sum(Staff)', 'Recommended Staff')
+    with instrument.timed('render:roster'):
+        return render_pool.render_html(make_configured_heat_map, (cells, 'sum(Staff)', 'Recommended Staff'))
+
+def make_roster_table(staff, products):
+    """
+    Lay out the roster of one branch as a table of shifts by department
+
+    Parameters
+    ----------
+    staff: numpy array
+        the staff of the branch by day of week, time of day and product line
+    products: list of str
+        the product lines
+
+    Returns
+    -------
+    html object
+        a table with one row per day of week and time of day
+    """
+    header = html.Tr([html.Th('Shift')] + [html.Th(product) for product in products] + [html.Th('Total')])
+    rows = [html.Tr([html.Td('{} {}'.format(day, time_of_day))] +
+                    [html.Td(int(count)) for count in staff[i, j]] +
+                    [html.Td(int(staff[i, j].sum()))])
+            for i, day in enumerate(aggregate.DAYS)
+            for j, time_of_day in enumerate(aggregate.TIMES)]
+    return html.Table([header] + rows, style={'width': '100%'})
+
+def make_chart_frame(chart_id, width, height):
+    """
+    Make the component a chart is drawn in
+
+    Parameters
+    ----------
+    chart_id: str
+        the id of the component
+    width: str
+        the width in pixels
+    height: str
+        the height in pixels
+
+    Returns
+    -------
+    Dash component
+        a dcc.Graph if NATIVE_CHARTS is set, otherwise an iframe
+    """
+    if NATIVE_CHARTS:
+        return dcc.Graph(id=chart_id,
+                         config={'displayModeBar': False},
+                         style={'width': width + 'px', 'height': height + 'px'})
+
+    return html.Iframe(sandbox='allow-scripts',
+                       id=chart_id,
+                       height=height,
+                       width=width,
+                       style={'border-width': '0px'})
+
+# New batches of raw sales dropped into this directory are folded into the
+# aggregates by every worker. Clear it whenever the cleaned data is rebuilt.
+INCOMING_DIR = os.path.join('data', 'incoming')
+REFRESH_INTERVAL = float(os.environ.get('REFRESH_INTERVAL', '60'))
+HEAT_MAP_KINDS = ['total_sales', 'customer_traffic', 'transaction_size',
+                  'customer_satisfaction', 'heat_maps']
+
+loaded_batches = set()
+failed_batches = set()
+last_refresh = 0
+refresh_lock = threading.Lock()
+
+# Render every chart state in the background after startup and after every
+# data refresh, so that the first visit of a store does not pay for it.
+# Set WARM_CACHE=0 to only render charts on demand.
+WARM_CACHE = os.environ.get('WARM_CACHE', '1') == '1'
+warm_generation = 0
+warm_lock = threading.Lock()
+
+def get_warm_keys():
+    """
+    List the cache keys of the charts drawn by the layout, store by store
+
+    Returns
+    -------
+    list of tuple
+        (chart kind, branch, day of week, time of day), no more than the
+        chart cache holds
+    """
+    if SHARED_HEAT_MAPS:
+        heat_map_kinds = ['heat_maps']
+    else:
+        heat_map_kinds = [kind for kind, _, _ in aggregate.HEAT_MAPS]
+
+    keys = []
+    for branch in branch_labels:
+        keys += [(kind, branch, None, None) for kind in heat_map_kinds]
+        keys += [('bar_plots', branch, day, time_of_day)
+                 for day in aggregate.DAYS for time_of_day in aggregate.TIMES]
+    return keys[:chart_cache.MAX_SIZE]
+
+def warm_cache():
+    """
+    Start rendering every chart state in a background thread
+
+    A warm-up still running from before a refresh stops at its next chart.
+    """
+    global warm_generation
+
+    # Plotly figures are cheap to build and are not cached
+    if not WARM_CACHE or NATIVE_CHARTS:
+        return
+    with warm_lock:
+        warm_generation += 1
+        generation = warm_generation
+
+    def warm():
+        start = time.perf_counter()
+        keys = get_warm_keys()
+        for key in keys:
+            if generation != warm_generation:
+                return
+            try:
+                get_chart_html(*key)
+            except Exception:
+                logging.exception('Could not warm the chart cache with %s', key)
+                return
+        logging.info('Warmed %d charts in %.2fs', len(keys), time.perf_counter() - start)
+
+    threading.Thread(target=warm, name='warm_cache', daemon=True).start()
+
+def get_bucket_keys(branches):
+    """
+    List the cache keys of every chart of some branches in finer time buckets
+
+    Parameters
+    ----------
+    branches: list of str
+        the characters used to represent the supermarket branches
+
+    Returns
+    -------
+    list of tuple
+        (chart kind, branch, day of week, time bucket, width)
+    """
+    keys = []
+    for width in aggregate.BUCKET_WIDTHS:
+        if width == aggregate.SHIFT_MINUTES:
+            continue
+        buckets = aggregate.get_time_buckets(width)
+        for branch_index in branches:
+            keys += [(kind, branch_index, None, None, width) for kind in HEAT_MAP_KINDS]
+            keys += [('bar_plots', branch_index, day, time_of_day, width)
+                     for day in aggregate.DAYS for time_of_day in buckets]
+    return keys
+
+def load_sales(sales):
+    """
+    Replace the data behind the charts, e.g. to benchmark other data
+
+    Parameters
+    ----------
+    sales: pandas DataFrame
+        cleaned sales with the columns of data/supermarket_sales_clean.csv
+    """
+    global cube, heat_map_table, slot_cube, daily_sums, prefix_sums, first_date, last_date
+    global forecast_model, roster_inputs, branch_cities, branch_labels, store_options, prerendered
+
+    cube = aggregate.make_cube(sales)
+    slot_cube = aggregate.make_slot_cube(sales, list(cube.index.unique(level='Branch')),
+                                         list(cube.index.unique(level='Product line')))
+    bucket_tables.clear()
+    bucket_bar_plot_tables.clear()
+    daily_sums = aggregate.make_daily_sums(sales, list(cube.index.unique(level='Branch')),
+                                           list(cube.index.unique(level='Product line')))
+    prefix_sums = aggregate.make_prefix_sums(daily_sums)
+    first_date = daily_sums.index.unique(level='Date').min()
+    last_date = daily_sums.index.unique(level='Date').max()
+    get_range_tables.cache_clear()
+    get_range_bar_plot_tables.cache_clear()
+    forecast_model = forecast.fit(forecast.make_weekly_series(daily_sums))
+    get_forecast_tables.cache_clear()
+    roster_inputs = schedule.make_inputs(cube, len(daily_sums.index.unique(level='Date')) / len(aggregate.DAYS))
+    branch_cities = aggregate.get_branch_cities(sales)
+    branch_labels = aggregate.make_branch_labels(branch_cities)
+    store_options = [{'label': label, 'value': branch} for branch, label in branch_labels.items()]
+    heat_map_table = aggregate.make_heat_map_table(cube)
+    heat_map_tables.clear()
+    heat_map_tables.update(aggregate.make_heat_map_tables(heat_map_table))
+    bar_plot_tables.clear()
+    bar_plot_tables.update(aggregate.make_bar_plot_tables(cube))
+    chart_cache.invalidate()
+    api.publish(cube, prefix_sums, first_date, last_date)
+    prerendered = {}
+    warm_cache()
+
+def append_sales(raw):
+    """
+    Fold a batch of new sales into the aggregates behind the charts
+
+    Every aggregate is computed before any is replaced, so a batch that
+    fails leaves the charts consistent with the batches before it.
+
+    Parameters
+    ----------
+    raw: pandas DataFrame
+        new sales with the columns of data/supermarket_sales.csv
+
+    Returns
+    -------
+    list of tuple
+        the (branch, day of week, time of day) combinations that changed
+    """
+    global cube, heat_map_table, slot_cube, daily_sums, prefix_sums, first_date, last_date
+    global forecast_model, roster_inputs, branch_cities, branch_labels, store_options, prerendered
+
+    sales = ingest.clean(raw)
+    batch_cube = aggregate.make_batch_cube(sales)
+    # e.g. a header only export or sales after closing time
+    if batch_cube.empty:
+        return []
+    new_cube = aggregate.fill_cube(aggregate.add_sums(cube, batch_cube))
+    changed = list(batch_cube.index.droplevel('Product line').unique())
+    new_heat_map_table = aggregate.make_heat_map_table(new_cube)
+    branches = list(new_cube.index.unique(level='Branch'))
+    products = list(new_cube.index.unique(level='Product line'))
+
+    # Line the slots up with any new branch or product line before adding
+    batch_slot_cube = aggregate.make_slot_cube(sales, branches, products)
+    new_slot_cube = aggregate.add_sums(slot_cube.reindex(batch_slot_cube.index, fill_value=0),
+                                       batch_slot_cube)
+
+    # Likewise for the days, then accumulate again in day of week order
+    dates = daily_sums.index.unique(level='Date').union(sales['Date_time'].dt.normalize().unique())
+    if len(new_cube) == len(cube):
+        new_daily_sums = aggregate.extend_daily_sums(
+            daily_sums, aggregate.make_daily_sums(sales, branches, products))
+    else:
+        batch_daily_sums = aggregate.make_daily_sums(sales, branches, products, dates)
+        new_daily_sums = aggregate.add_sums(daily_sums.reindex(batch_daily_sums.index, fill_value=0),
+                                            batch_daily_sums)
+    new_prefix_sums = aggregate.make_prefix_sums(new_daily_sums)
+    new_forecast_model = forecast.fit(forecast.make_weekly_series(new_daily_sums))
+    new_roster_inputs = schedule.make_inputs(new_cube, len(dates) / len(aggregate.DAYS))
+
+    # Offer new branches in the store selectors of the next page loads
+    new_branch_cities = branch_cities.combine_first(aggregate.get_branch_cities(sales))
+    new_branch_labels = aggregate.make_branch_labels(new_branch_cities)
+
+    bar_plot_updates = {}
+    if len(new_cube) == len(cube):
+        changed_branches = sorted({key[0] for key in changed})
+        heat_map_updates = aggregate.make_heat_map_tables(new_heat_map_table.loc[changed_branches])
+        aggregate.update_bar_plot_tables(bar_plot_updates, new_cube, changed)
+        stale_keys = ([(kind, branch, None, None)
+                       for branch in changed_branches
+                       for kind in HEAT_MAP_KINDS] +
+                      [('bar_plots',) + key for key in changed] +
+                      get_bucket_keys(changed_branches))
+    else:
+        # A new branch or product line changes the shape of every table
+        heat_map_updates = aggregate.make_heat_map_tables(new_heat_map_table)
+        bar_plot_updates = aggregate.make_bar_plot_tables(new_cube)
+        stale_keys = None
+
+    # Swap everything in at once
+    cube = new_cube
+    heat_map_table = new_heat_map_table
+    heat_map_tables.update(heat_map_updates)
+    bar_plot_tables.update(bar_plot_updates)
+    slot_cube = new_slot_cube
+    bucket_tables.clear()
+    if stale_keys is None:
+        bucket_bar_plot_tables.clear()
+    else:
+        for key in [key for key in bucket_bar_plot_tables if key[1] in changed_branches]:
+            del bucket_bar_plot_tables[key]
+    daily_sums = new_daily_sums
+    prefix_sums = new_prefix_sums
+    # Date ranges and the API reach the days of the batch
+    first_date = dates.min()
+    last_date = dates.max()
+    get_range_tables.cache_clear()
+    get_range_bar_plot_tables.cache_clear()
+    forecast_model = new_forecast_model
+    get_forecast_tables.cache_clear()
+    roster_inputs = new_roster_inputs
+    branch_cities = new_branch_cities
+    branch_labels = new_branch_labels
+    store_options = [{'label': label, 'value': branch} for branch, label in branch_labels.items()]
+    if stale_keys is None:
+        chart_cache.invalidate()
+    else:
+        chart_cache.discard(stale_keys)
+    api.publish(cube, prefix_sums, first_date, last_date)
+    # Pre-rendered charts no longer match the data
+    prerendered = {}
+    warm_cache()
+    return changed
+
+@server.before_request
+def refresh_sales():
+    """
+    Load new batches from INCOMING_DIR at most every REFRESH_INTERVAL seconds
+
+    A batch that fails to load is logged and skipped from then on, so that
+    it neither fails the request that found it nor is retried forever.
+    Rename the file to load it again once fixed.
+    """
+    global last_refresh
+
+    if time.time() - last_refresh < REFRESH_INTERVAL or not refresh_lock.acquire(blocking=False):
+        return
+    try:
+        last_refresh = time.time()
+        if not os.path.isdir(INCOMING_DIR):
+            return
+        for name in sorted(os.listdir(INCOMING_DIR)):
+            if not name.endswith('.csv') or name in loaded_batches or name in failed_batches:
+                continue
+            try:
+                with instrument.timed('append_sales'):
+                    append_sales(ingest.read_raw(os.path.join(INCOMING_DIR, name)))
+            except Exception:
+                failed_batches.add(name)
+                logging.exception('Could not load new sales from %s, skipping it', name)
+                continue
+            loaded_batches.add(name)
+            logging.info('Loaded new sales from %s', name)
+    finally:
+        refresh_lock.release()
+
+def get_checked_date_range(start_date, end_date, width):
+    """
+    Get the date range of a callback, which only applies to shifts
+
+    Parameters
+    ----------
+    start_date: str
+        the first date picked
+    end_date: str
+        the last date picked
+    width: int
+        the time bucket width in minutes
+
+    Returns
+    -------
+    tuple or None
+        the output of get_date_range
+    """
+    dates = get_date_range(start_date, end_date)
+    # The time buckets are back to shifts once their dropdown updates
+    if dates is not None and width != aggregate.SHIFT_MINUTES:
+        raise PreventUpdate
+    return dates
+
+# Render the heat maps in one iframe sharing one dataset, or in four iframes
+if SHARED_HEAT_MAPS:
+    # Arrange all heat maps
+    heat_map_frames = [make_chart_frame('heat_maps', '1480', '300')]
+else:
+    # Arrange total sales, customer traffic, average transaction size and
+    # customer satisfaction heat maps
+    heat_map_frames = [make_chart_frame(kind, '370', '300') for kind, _, _ in aggregate.HEAT_MAPS]
+
+def serve_layout():
+    """
+    Lay out the dashboard for a new page load, so that the stores and the
+    dates on offer include the batches added since startup
+
+    Returns
+    -------
+    html object
+        the layout of the app
+    """
+    return html.Div([
+        html.Div([ 
+            html.H1(
+                children = 'Supermarket Staffing',
+                style = dict(textAlign = 'center')),
+
+            html.P(
+                children = 'Review historical sales of supermarkets in Myanmar in order to improve staffing by day of week, time of day and/or department.',
+                style = dict(textAlign = 'left')),
+
+            dcc.Markdown('''
+                        Attribution: the dataset used to create this dashboard can be found [here](https://www.kaggle.com/aungpyaeap/supermarket-sales).
+                        It contains historical sales of a supermarket chain in Myanmar across three branches over the course of three months.
+                        '''),
+
+            html.Label('Select store:'),
+
+            # Arrange radio buttoms or a dropdown menu to select branch
+            dcc.RadioItems(
+                id='Store',
+                options=store_options,
+                value=store_options[0]['value'])
+            if len(store_options) <= RADIO_MAX_STORES else
+            dcc.Dropdown(
+                id='Store',
+                options=store_options,
+                value=store_options[0]['value'],
+                searchable=True,
+                clearable=False,
+                style={'width': '40%'}),
+
+            html.Label('Select time buckets:'),
+
+            # Arrange a dropdown menu to select the width of the time buckets
+            dcc.Dropdown(
+                id='time_bucket',
+                options=[{'label': 'Shifts' if width == aggregate.SHIFT_MINUTES
+                          else '{} minutes'.format(width), 'value': width}
+                         for width in aggregate.BUCKET_WIDTHS],
+                value=aggregate.SHIFT_MINUTES,
+                clearable=False,
+                style={'width': '40%'}),
+
+            html.Label('Select dates:'),
+
+            # Arrange a date picker to restrict the charts to a date range
+            # Left empty it shows all dates, including those added since
+            dcc.DatePickerRange(
+                id='date_range',
+                min_date_allowed=first_date.strftime('%Y-%m-%d'),
+                max_date_allowed=last_date.strftime('%Y-%m-%d'),
+                start_date_placeholder_text=first_date.strftime('%b %d, %Y'),
+                end_date_placeholder_text=last_date.strftime('%b %d, %Y'),
+                clearable=True,
+                display_format='MMM D, YYYY'),
+
+            # Hold the bar plots of the selected store when CLIENTSIDE_CHARTS is set
+            dcc.Store(id='bar_plot_data'),
+        ], style = {'backgroundColor': 'gainsboro'}),
   
-    dcc.Tabs(id='tabs', children=[
-        # The first tab 
-        dcc.Tab(label='Store Performance Summary', children=[
-            html.Div(children = [
-                html.Div([
-                    html.H2('Store Performance Summary'),
-
-                    dcc.Markdown('''
-                    **Purpose:**  Identify the day of the week and time of day where the store might be overstaffed/understaffed.
-
-                    **Some guiding questions:**
-                    - Are there periods of time with **high total sales**, **high customer traffic**, **high transaction sizes** but **low customer satisfaction**? 
-                        - Have we previously understaffed when the store is busy?
-                    - Are there periods of time with **low total sales**, **low customer traffic**, **low transaction sizes** and **high customer satisfaction**?
-                        - Have we previously overstaffed when the store is quiet?
-                    - Are there periods of **high customer traffic** but **small transaction sizes**?
-                        - Would additional staff helping customers persuade customers to spend more?
-
-                    **Note**: *Morning* is 9:00-12:59, *Afternoon* is 13:00-16:59 and *Evening* is 17:00-20:59. 
-                    ''')
-                    ], style = {'backgroundColor': 'Beige', 'border-width': '0px'}
-                ),
-
-                dbc.Row([
-                    # Arrange total sales heat map
-                    html.Iframe(sandbox='allow-scripts',
-                                id='total_sales',
-                                height='300',
-                                width='370',
-                                style={'border-width': '0px'},
-                                srcDoc=make_total_sales().to_html()
-                    ),
-                                
-                    # Arrange customer traffic heat map
-                    html.Iframe(sandbox='allow-scripts',
-                                id='customer_traffic',
-                                height='300',
-                                width='370',
-                                style={'border-width': '0px'},
-                                srcDoc=make_customer_traffic().to_html()
-                    ),
-                                
-                    # Arrange average transaction size heat map
-                    html.Iframe(sandbox='allow-scripts',
-                                id='transaction_size',
-                                height='300',
-                                width='370',
-                                style={'border-width': '0px'},
-                                srcDoc=make_transaction_size().to_html()
+        dcc.Tabs(id='tabs', children=[
+            # The first tab 
+            dcc.Tab(label='Store Performance Summary', children=[
+                html.Div(children = [
+                    html.Div([
+                        html.H2('Store Performance Summary'),
+
+                        dcc.Markdown('''
+                        **Purpose:**  Identify the day of the week and time of day where the store might be overstaffed/understaffed.
+
+                        **Some guiding questions:**
+                        - Are there periods of time with **high total sales**, **high customer traffic**, **high transaction sizes** but **low customer satisfaction**? 
+                            - Have we previously understaffed when the store is busy?
+                        - Are there periods of time with **low total sales**, **low customer traffic**, **low transaction sizes** and **high customer satisfaction**?
+                            - Have we previously overstaffed when the store is quiet?
+                        - Are there periods of **high customer traffic** but **small transaction sizes**?
+                            - Would additional staff helping customers persuade customers to spend more?
+
+                        **Note**: *Morning* is 9:00-12:59, *Afternoon* is 13:00-16:59 and *Evening* is 17:00-20:59. 
+                        Select finer time buckets above to see the day by the hour or by the quarter hour, or select dates to look at part of the history.
+                        ''')
+                        ], style = {'backgroundColor': 'Beige', 'border-width': '0px'}
                     ),
-                                
-                    # Arrange customer satisfaction heat map
-                    html.Iframe(sandbox='allow-scripts',
-                                id='customer_satisfaction',
-                                height='300',
-                                width='370',
-                                style={'border-width': '0px'},
-                                srcDoc=make_customer_satisfaction().to_html()
-                    )
-                ]),
-            ], className='container'), 
-        ]),
-
-        # the second tab
-        dcc.Tab(label='Compare Store Performance By Department', children=[
-            html.Div(children = [
-                html.Div([
-                    html.H2('Compare Store Performance By Department'),
-
-                    dcc.Markdown('''
-                    **Purpose:** Compare department-specific performance for a particular day and time to identify when and where to increase/reduce staff.
-
-                    **Guiding example:** I'm considering adding staff to Sunday evening. I could consider staffing more in the Sports & Travel department where there is highest traffic and lowest satisfaction. 
-                    Before deciding, I can compare the performance to that of Saturday afternoon. The Sports & Travel department seems to also have high customer traffic but much lower transaction sizes on Saturday afternoon compared to Sunday evenings. 
-                    I should schedule in more staff in the Sports & Travel department on Saturday afternoons instead.  
-
-                    ''')
-                ], style = {'backgroundColor': 'aliceblue', 'border-width': '0px'}),
+
+                    dbc.Row(heat_map_frames),
+                ], className='container'), 
+            ]),
+
+            # the second tab
+            dcc.Tab(label='Compare Store Performance By Department', children=[
+                html.Div(children = [
+                    html.Div([
+                        html.H2('Compare Store Performance By Department'),
+
+                        dcc.Markdown('''
+                        **Purpose:** Compare department-specific performance for a particular day and time to identify when and where to increase/reduce staff.
+
+                        **Guiding example:** I'm considering adding staff to Sunday evening. I could consider staffing more in the Sports & Travel department where there is highest traffic and lowest satisfaction. 
+                        Before deciding, I can compare the performance to that of Saturday afternoon. The Sports & Travel department seems to also have high customer traffic but much lower transaction sizes on Saturday afternoon compared to Sunday evenings. 
+                        I should schedule in more staff in the Sports & Travel department on Saturday afternoons instead.  
+
+                        ''')
+                    ], style = {'backgroundColor': 'aliceblue', 'border-width': '0px'}),
 
             
-                html.H3('''Select first shift to compare:'''),
+                    html.H3('''Select first shift to compare:'''),
             
-                html.Div([
-                    # Arrange dropdown menu to select day of week
-                    html.Label('Day of week:'),
+                    html.Div([
+                        # Arrange dropdown menu to select day of week
+                        html.Label('Day of week:'),
 
-                    dcc.Dropdown(
-                        id='day_of_week',
-                        options=[{'label': i, 'value': i} for i in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']],
-                        value='Monday',
-                        style={'width': '60%'}),
+                        dcc.Dropdown(
+                            id='day_of_week',
+                            options=[{'label': i, 'value': i} for i in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']],
+                            value='Monday',
+                            style={'width': '60%'}),
             
-                    html.Label('Time of day:'),
+                        html.Label('Time of day:'),
             
-                    # Arrange dropdown menu to select time of day
-                    dcc.Dropdown(
-                        id='time_of_day',
-                        options=[{'label': i, 'value': i} for i in df['Time_of_day'].unique()],
-                        value='Morning',
-                        style={'width': '60%'})
-                ], style={'columnCount': 2}),
-
-                # Arrange bar plots
-                html.Iframe(
-                    sandbox='allow-scripts',
-                    id='bar_plots',
-                    height='400',
-                    width='1500',
-                    style={'border-width': '0px'},
-                    srcDoc=con_plt().to_html()
-                ),
-
-                html.H3('''Select second shift to compare:'''),
-
-                html.Div([
-                    # Arrange dropdown menu to select day of week
-                    html.Label('Day of week:'),
+                        # Arrange dropdown menu to select time of day
+                        dcc.Dropdown(
+                            id='time_of_day',
+                            options=[{'label': i, 'value': i} for i in aggregate.TIMES],
+                            value='Morning',
+                            style={'width': '60%'})
+                    ], style={'columnCount': 2}),
 
-                    dcc.Dropdown(
-                        id='day_of_week2',
-                        options=[{'label': i, 'value': i} for i in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']],
-                        value='Monday',
-                        style={'width': '60%'}),
+                    # Arrange bar plots
+                    make_chart_frame('bar_plots', '1500', '400'),
+
+                    html.H3('''Select second shift to compare:'''),
+
+                    html.Div([
+                        # Arrange dropdown menu to select day of week
+                        html.Label('Day of week:'),
+
+                        dcc.Dropdown(
+                            id='day_of_week2',
+                            options=[{'label': i, 'value': i} for i in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']],
+                            value='Monday',
+                            style={'width': '60%'}),
             
-                    html.Label('Time of day:'),
+                        html.Label('Time of day:'),
             
-                    # Arrange dropdown menu to select time of day
+                        # Arrange dropdown menu to select time of day
+                        dcc.Dropdown(
+                            id='time_of_day2',
+                            options=[{'label': i, 'value': i} for i in aggregate.TIMES],
+                            value='Morning',
+                            style={'width': '60%'})
+                    ], style={'columnCount': 2}),
+
+                    # Arrange bar plots
+                    make_chart_frame('bar_plots2', '1500', '400'),
+                ], className='container'),
+            ]),
+
+            # the third tab
+            dcc.Tab(label='Compare Stores', children=[
+                html.Div(children = [
+                    html.Div([
+                        html.H2('Compare Stores'),
+
+                        dcc.Markdown('''
+                        **Purpose:** Compare the same day of week and time of day across stores, or against the average store of the chain, to find stores that are busier or quieter than the rest.
+                        ''')
+                    ], style = {'backgroundColor': 'lavender', 'border-width': '0px'}),
+
+                    html.Div([
+                        # Arrange dropdown menu to select stores
+                        html.Label('Stores:'),
+
+                        dcc.Dropdown(
+                            id='compare_stores',
+                            options=store_options,
+                            value=[option['value'] for option in store_options[:4]],
+                            multi=True),
+
+                        html.Label('Metric:'),
+
+                        # Arrange dropdown menu to select metric
+                        dcc.Dropdown(
+                            id='compare_metric',
+                            options=[{'label': plot_title, 'value': kind} for kind, _, plot_title in aggregate.HEAT_MAPS],
+                            value='total_sales',
+                            clearable=False),
+
+                        # Arrange radio buttons to show values or differences
+                        dcc.RadioItems(
+                            id='compare_mode',
+                            options=[{'label': 'Values', 'value': 'values'},
+                                     {'label': 'Difference from chain average', 'value': 'delta'}],
+                            value='values')
+                    ]),
+
+                    # Arrange store comparison heat maps
+                    make_chart_frame('store_comparison', '1500', '800'),
+                ], className='container'),
+            ]),
+
+            # the fourth tab
+            dcc.Tab(label='Staffing Forecast', children=[
+                html.Div(children = [
+                    html.Div([
+                        html.H2('Staffing Forecast'),
+
+                        dcc.Markdown('''
+                        **Purpose:** Plan the staff of the coming weeks by the customer traffic and sales expected on every day of week and time of day.
+
+                        **Model:** the weekly totals of each store follow a straight line fitted to every complete week of sales, and are split over the week by the share each day and time of day had so far.
+                        ''')
+                    ], style = {'backgroundColor': 'honeydew', 'border-width': '0px'}),
+
+                    html.Label('Weeks ahead:'),
+
+                    # Arrange dropdown menu to select the forecast week
                     dcc.Dropdown(
-                        id='time_of_day2',
-                        options=[{'label': i, 'value': i} for i in df['Time_of_day'].unique()],
-                        value='Morning',
-                        style={'width': '60%'})
-                ], style={'columnCount': 2}),
-
-                # Arrange bar plots
-                html.Iframe(
-                    sandbox='allow-scripts',
-                    id='bar_plots2',
-                    height='400',
-                    width='1500',
-                    style={'border-width': '0px'},
-                    srcDoc=con_plt().to_html()
-                ),    
-            ], className='container'),
-        ]),
-    ]),       
-])
+                        id='forecast_weeks',
+                        options=[{'label': str(weeks), 'value': weeks} for weeks in range(1, FORECAST_WEEKS + 1)],
+                        value=1,
+                        clearable=False,
+                        style={'width': '40%'}),
+
+                    html.P(id='forecast_week'),
+
+                    dbc.Row([make_chart_frame('forecast_' + kind, '370', '300')
+                             for kind in ['traffic', 'sales']]),
+                ], className='container'),
+            ]),
+
+            # the fifth tab
+            dcc.Tab(label='Recommended Roster', children=[
+                html.Div(children = [
+                    html.Div([
+                        html.H2('Recommended Roster'),
+
+                        dcc.Markdown('''
+                        **Purpose:** Turn the traffic, sales and satisfaction of every shift and department into a weekly roster.
+
+                        **How it works:** every extra staff member in a department serves the customers the others could not, and is worth their sales, weighted up where satisfaction is low, minus the cost of the shift.
+                        Each store gets the most valuable staff shifts that fit its headcount and labour budget, with at least one staff member on every shift.
+                        ''')
+                    ], style = {'backgroundColor': 'mistyrose', 'border-width': '0px'}),
+
+                    html.Div([
+                        html.Label('Most staff on the floor at once:'),
+                        dcc.Input(id='roster_max_staff', type='number', min=1, step=1, value=schedule.MAX_STAFF),
+
+                        html.Label('Weekly labour budget (MMK):'),
+                        dcc.Input(id='roster_budget', type='number', min=0, value=schedule.BUDGET),
+
+                        html.Label('Cost of a staff shift (MMK):'),
+                        dcc.Input(id='roster_staff_cost', type='number', min=1, value=schedule.STAFF_COST),
+
+                        html.Label('Customers a staff member serves per shift:'),
+                        dcc.Input(id='roster_customers', type='number', min=1, value=schedule.CUSTOMERS_PER_STAFF),
+                    ], style={'columnCount': 2}),
+
+                    html.P(id='roster_summary'),
+
+                    make_chart_frame('roster_heat_map', '370', '300'),
+
+                    html.Div(id='roster_table'),
+                ], className='container'),
+            ]),
+        ]),       
+    ])
+
+app.layout = serve_layout
+
+# The callbacks of a store change share their data server side instead of
+# through a dcc.Store, which would add a round trip to the browser and back
+# before any chart could render. heat_map_tables and bar_plot_tables hold
+# the cells of every store and shift, sliced once per data load, and
+# chart_cache renders each chart once however many callbacks ask for it.
+if SHARED_HEAT_MAPS:
+    @app.callback(
+        Output('heat_maps', CHART_PROPERTY),
+        [Input('Store', 'value'),
+         Input('time_bucket', 'value'),
+         Input('date_range', 'start_date'),
+         Input('date_range', 'end_date')])
+
+    def update_plot(branch_index, width, start_date, end_date):
+        """
+        Update heat maps
+
+        Parameters:
+        -----------
+        branch_index: str
+            the character used to represent the supermarket branch
+        width: int
+            the time bucket width in minutes
+        start_date: str
+            the first date of the sales to show
+        end_date: str
+            the last date of the sales to show
+
+        Returns
+        -------
+        html object
+            all updated heat maps in one html document
+        """
+        dates = get_checked_date_range(start_date, end_date, width)
+        return get_chart('heat_maps', branch_index, width=width, dates=dates)
+else:
+    @app.callback(
+        [Output('total_sales', CHART_PROPERTY),
+         Output('customer_traffic', CHART_PROPERTY),
+         Output('transaction_size', CHART_PROPERTY),
+         Output('customer_satisfaction', CHART_PROPERTY)],
+
+         [dash.dependencies.Input('Store', 'value'),
+          dash.dependencies.Input('time_bucket', 'value'),
+          dash.dependencies.Input('date_range', 'start_date'),
+          dash.dependencies.Input('date_range', 'end_date')])
+
+    def update_plot(branch_index, width, start_date, end_date):
+        """
+        Update heat maps
+
+        Parameters:
+        -----------
+        branch_index: str
+            the character used to represent the supermarket branch
+        width: int
+            the time bucket width in minutes
+        start_date: str
+            the first date of the sales to show
+        end_date: str
+            the last date of the sales to show
+
+        Returns
+        -------
+        html object 
+            all updated heat maps in html format
+        """
+        dates = get_checked_date_range(start_date, end_date, width)
+
+        # The heat maps are independent, so render them side by side when
+        # RENDER_WORKERS is set
+        (updated_total_sales, updated_customer_traffic,
+         updated_transaction_size, updated_customer_satisfaction) = render_pool.map_charts(
+            lambda kind: get_chart(kind, branch_index, width=width, dates=dates), [kind for kind, _, _ in aggregate.HEAT_MAPS])
+
+        return updated_total_sales, updated_customer_traffic, updated_transaction_size, updated_customer_satisfaction
 
 @app.callback(
-    [Output('total_sales', 'srcDoc'),
-     Output('customer_traffic', 'srcDoc'),
-     Output('transaction_size', 'srcDoc'),
-     Output('customer_satisfaction','srcDoc')],
+    [Output(frame.id, 'style' if NATIVE_CHARTS else 'height') for frame in heat_map_frames],
+    [Input('time_bucket', 'value')])
 
-     [dash.dependencies.Input('Store', 'value')])
+def update_heat_map_height(width):
+    """
+    Fit the heat map frames to the number of time buckets
+
+    Parameters
+    ----------
+    width: int
+        the time bucket width in minutes
 
-def update_plot(branch_index):
+    Returns
+    -------
+    list
+        the height of every heat map iframe, or the style of every graph if
+        NATIVE_CHARTS is set
     """
-    Update heat maps
+    height = str(get_heat_map_height(aggregate.get_time_buckets(width)) + 170)
+    if NATIVE_CHARTS:
+        return [dict(frame.style, height=height + 'px') for frame in heat_map_frames]
+    return [height for _ in heat_map_frames]
 
-    Parameters:
-    -----------
-    branch_index: str
-        the character used to represent the supermarket branch
+@app.callback(
+    [Output('time_bucket', 'value'),
+     Output('time_bucket', 'disabled')],
+    [Input('date_range', 'start_date'),
+     Input('date_range', 'end_date')])
+
+def update_time_bucket(start_date, end_date):
+    """
+    Show shifts while a date range is picked, since only the shifts are
+    summed day by day
+
+    Parameters
+    ----------
+    start_date: str
+        the first date picked
+    end_date: str
+        the last date picked
 
     Returns
     -------
-    html object 
-        all updated heat maps in html format
+    tuple
+        the time bucket width and whether it can be changed
     """
-    updated_total_sales = make_total_sales(branch_index).to_html()
-    updated_customer_traffic = make_customer_traffic(branch_index).to_html()
-    updated_transaction_size= make_transaction_size(branch_index).to_html()
-    updated_customer_satisfaction = make_customer_satisfaction(branch_index).to_html()
+    if get_date_range(start_date, end_date) is None:
+        return dash.no_update, False
+    return aggregate.SHIFT_MINUTES, True
+
+@app.callback(
+    [Output('time_of_day', 'options'),
+     Output('time_of_day', 'value'),
+     Output('time_of_day2', 'options'),
+     Output('time_of_day2', 'value')],
+    [Input('time_bucket', 'value')])
+
+def update_time_options(width):
+    """
+    List the time buckets of a width in both time of day dropdowns
+
+    Parameters
+    ----------
+    width: int
+        the time bucket width in minutes
+
+    Returns
+    -------
+    tuple
+        the options and the selected first bucket of each dropdown
+    """
+    times = aggregate.get_time_buckets(width)
+    options = [{'label': i, 'value': i} for i in times]
+    return options, times[0], options, times[0]
+
+if CLIENTSIDE_CHARTS:
+    @app.callback(
+        Output('bar_plot_data', 'data'),
+        [Input('Store', 'value'),
+         Input('time_bucket', 'value'),
+         Input('date_range', 'start_date'),
+         Input('date_range', 'end_date')])
+
+    def update_bar_plot_data(branch_index, width, start_date, end_date):
+        """
+        Update the bar plot data held in the browser
+
+        Parameters
+        ----------
+        branch_index: str
+            the character used to represent the supermarket branch
+        width: int
+            the time bucket width in minutes
+        start_date: str
+            the first date of the sales to show
+        end_date: str
+            the last date of the sales to show
+
+        Returns
+        -------
+        dict
+            the bar plots of every day and time of the store
+        """
+        with instrument.timed('build_bar_plot_data'):
+            dates = get_checked_date_range(start_date, end_date, width)
+            return figures.make_bar_plot_data(get_bar_plot_tables(branch_index, width, dates), branch_index,
+                                              aggregate.get_time_buckets(width))
+
+    for suffix in ['', '2']:
+        app.clientside_callback(
+            ClientsideFunction(namespace='clientside', function_name='bar_plots'),
+            Output('bar_plots' + suffix, 'figure'),
+            [Input('day_of_week' + suffix, 'value'),
+             Input('time_of_day' + suffix, 'value'),
+             Input('bar_plot_data', 'data')])
+else:
+    @app.callback(
+        dash.dependencies.Output('bar_plots', CHART_PROPERTY),
+        [dash.dependencies.Input('day_of_week', 'value'),
+         dash.dependencies.Input('time_of_day', 'value'),
+         dash.dependencies.Input('Store', 'value'),
+         dash.dependencies.Input('time_bucket', 'value'),
+         dash.dependencies.Input('date_range', 'start_date'),
+         dash.dependencies.Input('date_range', 'end_date')])
+
+    def update_plot(day_of_week, time_of_day, branch_index, width, start_date, end_date):
+        """
+        Update bar plots
 
-    return updated_total_sales, updated_customer_traffic, updated_transaction_size, updated_customer_satisfaction
+        Parameters
+        ----------
+        day_of_week: str
+            the day of week ranging from Monday to Sunday 
+        time_of_day: str
+            the time of day (Morning, Afternoon or Evening) or a finer time bucket
+        branch_index: str
+            the character used to represent the supermarket branch
+        width: int
+            the time bucket width in minutes
+        start_date: str
+            the first date of the sales to show
+        end_date: str
+            the last date of the sales to show
+
+        Returns
+        -------
+        html object 
+            all updated bar plots in html format
+        """
+        # The time of day is from the previous width until its dropdown updates
+        if time_of_day not in aggregate.get_time_buckets(width):
+            raise PreventUpdate
+        dates = get_checked_date_range(start_date, end_date, width)
+        bar_plots = get_chart('bar_plots', branch_index, day_of_week, time_of_day, width, dates)
+        return bar_plots
+
+    @app.callback(
+        dash.dependencies.Output('bar_plots2', CHART_PROPERTY),
+        [dash.dependencies.Input('day_of_week2', 'value'),
+         dash.dependencies.Input('time_of_day2', 'value'),
+         dash.dependencies.Input('Store', 'value'),
+         dash.dependencies.Input('time_bucket', 'value'),
+         dash.dependencies.Input('date_range', 'start_date'),
+         dash.dependencies.Input('date_range', 'end_date')])
+
+    def update_plot(day_of_week, time_of_day, branch_index, width, start_date, end_date):
+        """
+        Update bar plots
+
+        Parameters
+        ----------
+        day_of_week: str
+            the day of week ranging from Monday to Sunday 
+        time_of_day: str
+            the time of day (Morning, Afternoon or Evening) or a finer time bucket
+        branch_index: str
+            the character used to represent the supermarket branch
+        width: int
+            the time bucket width in minutes
+        start_date: str
+            the first date of the sales to show
+        end_date: str
+            the last date of the sales to show
+
+        Returns
+        -------
+        html object 
+            all updated bar plots in html format
+
+        """
+        # The time of day is from the previous width until its dropdown updates
+        if time_of_day not in aggregate.get_time_buckets(width):
+            raise PreventUpdate
+        dates = get_checked_date_range(start_date, end_date, width)
+        bar_plots = get_chart('bar_plots', branch_index, day_of_week, time_of_day, width, dates)
+        return bar_plots
 
 @app.callback(
-    dash.dependencies.Output('bar_plots', 'srcDoc'),
-    [dash.dependencies.Input('day_of_week', 'value'),
-     dash.dependencies.Input('time_of_day', 'value'),
-     dash.dependencies.Input('Store', 'value')])
+    Output('store_comparison', CHART_PROPERTY),
+    [Input('compare_stores', 'value'),
+     Input('compare_metric', 'value'),
+     Input('compare_mode', 'value'),
+     Input('date_range', 'start_date'),
+     Input('date_range', 'end_date')])
 
-def update_plot(day_of_week, time_of_day, branch_index):
+def update_store_comparison(branches, kind, mode, start_date, end_date):
     """
-    Update bar plots
+    Update store comparison heat maps
+
+    Parameters
+    ----------
+    branches: list of str
+        the characters used to represent the selected supermarket branches
+    kind: str
+        the kind of heat map to compare, e.g. total_sales
+    mode: str
+        'values' or 'delta' to show the difference from the chain average
+    start_date: str
+        the first date of the sales to show
+    end_date: str
+        the last date of the sales to show
+
+    Returns
+    -------
+    html object
+        the updated heat maps in html format
+    """
+    if not branches:
+        raise PreventUpdate
+    return get_store_comparison(branches, kind, mode == 'delta', get_date_range(start_date, end_date))
+
+@app.callback(
+    [Output('forecast_traffic', CHART_PROPERTY),
+     Output('forecast_sales', CHART_PROPERTY),
+     Output('forecast_week', 'children')],
+    [Input('Store', 'value'),
+     Input('forecast_weeks', 'value')])
+
+def update_forecast(branch_index, weeks_ahead):
+    """
+    Update forecast heat maps
 
     Parameters
     ----------
-    day_of_week: str
-        the day of week ranging from Monday to Sunday 
-    time_of_day: str
-        the time of day (Morning, Afternoon or Evening)
     branch_index: str
         the character used to represent the supermarket branch
+    weeks_ahead: int
+        1 for the week after the last sales, 2 for the one after and so on
 
     Returns
     -------
-    html object 
-        all updated bar plots in html format
+    tuple
+        the forecast traffic and sales heat maps in html format and the
+        week they forecast
     """
-    bar_plots = con_plt(day_of_week, time_of_day, branch_index).to_html()
-    return bar_plots
+    forecast_traffic, forecast_sales = render_pool.map_charts(
+        lambda heat_map: get_forecast_chart(branch_index, weeks_ahead, *heat_map),
+        forecast.FORECAST_HEAT_MAPS)
+    week = forecast.get_week_start(forecast_model, weeks_ahead)
+    return forecast_traffic, forecast_sales, 'Week of {:%B %d, %Y}'.format(week)
 
 @app.callback(
-    dash.dependencies.Output('bar_plots2', 'srcDoc'),
-    [dash.dependencies.Input('day_of_week2', 'value'),
-     dash.dependencies.Input('time_of_day2', 'value'),
-     dash.dependencies.Input('Store', 'value')])
+    [Output('roster_heat_map', CHART_PROPERTY),
+     Output('roster_summary', 'children'),
+     Output('roster_table', 'children')],
+    [Input('Store', 'value'),
+     Input('roster_max_staff', 'value'),
+     Input('roster_budget', 'value'),
+     Input('roster_staff_cost', 'value'),
+     Input('roster_customers', 'value')])
 
-def update_plot(day_of_week, time_of_day, branch_index):
+def update_roster(branch_index, max_staff, budget, staff_cost, customers_per_staff):
     """
-    Update bar plots
+    Update the recommended roster
 
     Parameters
     ----------
-    day_of_week: str
-        the day of week ranging from Monday to Sunday 
-    time_of_day: str
-        the time of day (Morning, Afternoon or Evening) 
     branch_index: str
         the character used to represent the supermarket branch
+    max_staff: int
+        the most staff on the floor of a branch at once
+    budget: float
+        the weekly labour budget of every branch
+    staff_cost: float
+        the labour cost of one staff shift
+    customers_per_staff: float
+        the customers one staff member serves in a department over a shift
 
     Returns
     -------
-    html object 
-        all updated bar plots in html format
-
+    tuple
+        the staff heat map in html format, the labour cost and the roster
+        table
     """
-    bar_plots = con_plt(day_of_week, time_of_day, branch_index).to_html()
-    return bar_plots
+    # Wait for a complete entry rather than solve for a half typed one
+    if None in (max_staff, budget, staff_cost, customers_per_staff) \
+            or max_staff < 1 or staff_cost <= 0 or customers_per_staff <= 0:
+        raise PreventUpdate
+
+    result = get_roster(max_staff, budget, staff_cost, customers_per_staff)
+    staff = result['staff'][result['inputs']['branches'].index(branch_index)]
+    shifts = int(staff.sum())
+    summary = '{} staff shifts a week for {:,.0f} MMK of the {:,.0f} MMK budget'.format(
+        shifts, shifts * staff_cost, budget)
+    return get_roster_chart(staff), summary, make_roster_table(staff, result['inputs']['products'])
+
+startup_time = time.perf_counter() - start_time
+if startup_time > STARTUP_BUDGET:
+    logging.warning('App startup took %.2fs, over the %.2fs budget', startup_time, STARTUP_BUDGET)
+else:
+    logging.info('App startup took %.2fs', startup_time)
+
+# Fork the render workers before the warm-up starts the first thread
+render_pool.start()
+
+# Start after the startup check, the workers serve requests during warm-up
+warm_cache()
 
 if __name__ == '__main__':
     app.run_server(debug=True)
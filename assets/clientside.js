@@ -0,0 +1,21 @@
+// Slice the bar plot data stored by figures.make_bar_plot_data so that
+// changing the day or time of day does not need a server round trip
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    clientside: {
+        bar_plots: function(day_of_week, time_of_day, data) {
+            if (!data) {
+                return {'data': [], 'layout': {}};
+            }
+            // The time of day is from the previous width until its
+            // dropdown updates, so show the first time bucket meanwhile
+            var cells = data.cells[day_of_week][time_of_day] ||
+                data.cells[day_of_week][data.times[0]];
+            var figure = JSON.parse(JSON.stringify(data.figure));
+            figure.data.forEach(function(trace, i) {
+                trace.x = data.product_lines;
+                trace.y = cells[i];
+            });
+            return figure;
+        }
+    }
+});
@@ -0,0 +1,317 @@
+"""
+Benchmark chart construction, serialization and callback latency
+
+Run from the home directory with e.g.
+`python benchmark.py --rows 1000 100000 10000000 --output bench.json`
+to time the hot paths of the dashboard on data scaled up from the cleaned
+CSV and compare the original inline-data charts with the pre-aggregated
+ones. Add `--branches 300` to time synthetic data with that many branches
+instead. Pass `--baseline bench.json` to fail when any timing is slower
+than the baseline by more than `--tolerance`.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import altair as alt
+
+# Measure cold renders without a background warm-up filling the cache
+os.environ.setdefault('WARM_CACHE', '0')
+import app
+import datastore
+import generate
+from aggregate import DAYS, TIMES
+
+# Embedding every row in a chart stops being practical beyond this size
+INLINE_MAX_ROWS = 100000
+
+def scale_data(df, rows, seed=0):
+    """
+    Resample the cleaned data to a given number of transactions
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+    rows: int
+        the number of transactions to return
+    seed: int
+        the random seed
+
+    Returns
+    -------
+    pandas DataFrame
+        rows sampled with replacement from df
+    """
+    return df.sample(n=rows, replace=True, random_state=seed).reset_index(drop=True)
+
+def make_inline_heat_map(df, branch_index, func, plot_title):
+    """
+    Make a heat map the original way, embedding and filtering every row
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+    branch_index: str
+        the character used to represent the supermarket branch
+    func: str
+        the Altair aggregate to be associated with alt.Color()
+    plot_title: str
+        the name to be used as title
+
+    Returns
+    -------
+    Altair chart object
+        a heat map
+    """
+    return (alt
+            .Chart(df)
+            .mark_rect()
+            .encode(alt.X('Day_of_week:N', title=None, sort=DAYS),
+                    alt.Y('Time_of_day:N', title=None, sort=TIMES),
+                    alt.Color(func, type='quantitative', title=None, scale=alt.Scale(scheme='greens')),
+                    tooltip=[alt.Tooltip(func, type='quantitative', title=plot_title, format=',.0f')])
+            .transform_filter(alt.FieldEqualPredicate(field='Branch', equal=branch_index))
+            .properties(width=180, height=130, title=plot_title)
+    )
+
+def make_inline_bar_plots(df, day_of_week, time_of_day, branch_index):
+    """
+    Make the four bar plots the original way, embedding every row
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+    day_of_week: str
+        the day of week ranging from Monday to Sunday
+    time_of_day: str
+        the time of day (Morning, Afternoon or Evening)
+    branch_index: str
+        the character used to represent the supermarket branch
+
+    Returns
+    -------
+    Altair chart object
+        concatenated bar plots
+    """
+    bar_plots = [(alt
+                  .Chart(df)
+                  .mark_bar(color='cornflowerblue')
+                  .encode(alt.X('Product line:N', title=None),
+                          alt.Y(func, type='quantitative', title=y_title))
+                  .transform_filter(alt.FieldEqualPredicate(field='Branch', equal=branch_index))
+                  .transform_filter(alt.FieldEqualPredicate(field='Day_of_week', equal=day_of_week))
+                  .transform_filter(alt.FieldEqualPredicate(field='Time_of_day', equal=time_of_day))
+                  .properties(width=250, height=175, title=plot_title))
+                 for func, plot_title, y_title in app.aggregate.BAR_PLOTS]
+    return alt.concat(*bar_plots, columns=4)
+
+def measure(function, repeat):
+    """
+    Time a function, keeping the fastest run
+
+    Parameters
+    ----------
+    function: function
+        called without arguments
+    repeat: int
+        the number of runs
+
+    Returns
+    -------
+    tuple
+        the fastest time in seconds and the result of the last run
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def post_callback(client, outputs, inputs):
+    """
+    Call a Dash callback through the Flask test client
+
+    Parameters
+    ----------
+    client: Flask test client
+        a client of app.server
+    outputs: list of tuple
+        (component id, property) of every callback output
+    inputs: list of tuple
+        (component id, property, value) of every callback input
+
+    Returns
+    -------
+    bytes
+        the response body
+    """
+    names = ['{}.{}'.format(i, p) for i, p in outputs]
+    # Dash names a callback with several outputs as ..a.b...c.d..
+    output = names[0] if len(names) == 1 else '..' + '...'.join(names) + '..'
+    response = client.post('/_dash-update-component', json={
+        'output': output,
+        'outputs': [{'id': i, 'property': p} for i, p in outputs] if len(outputs) > 1
+                   else {'id': outputs[0][0], 'property': outputs[0][1]},
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'changedPropIds': ['{}.{}'.format(i, p) for i, p, _ in inputs]})
+    if response.status_code != 200:
+        raise RuntimeError('{} returned {}'.format(output, response.status_code))
+    return response.data
+
+def run(df, rows, repeat, branches=None):
+    """
+    Benchmark every hot path on data of one size
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+    rows: int
+        the number of transactions to scale the data to
+    repeat: int
+        the number of runs of each measurement
+    branches: int
+        generate synthetic data with this many branches instead of
+        resampling df
+
+    Returns
+    -------
+    dict
+        maps each measurement to seconds or bytes
+    """
+    results = {}
+    if branches is None:
+        sales = scale_data(df, rows)
+    else:
+        sales = generate.generate(rows, branches=branches, clean=True)
+    branch, day, shift = 'A', 'Saturday', 'Evening'
+
+    results['load_sales_seconds'], _ = measure(lambda: app.load_sales(sales), 1)
+
+    # Re-bucketing only depends on the number of branches and slots
+    seconds, _ = measure(lambda: app.aggregate.make_heat_map_tables(app.aggregate.make_heat_map_table(
+        app.aggregate.rebin_cube(app.slot_cube, 15))), repeat)
+    results['rebin_15_minutes_seconds'] = seconds
+
+    # A date range is two binary searches and a subtraction of prefix sums
+    seconds, _ = measure(lambda: app.aggregate.query_prefix_sums(app.prefix_sums, '2019-02-01', '2019-02-28'), repeat)
+    results['date_range_query_seconds'] = seconds
+
+    seconds, chart = measure(lambda: app.make_total_sales(branch), repeat)
+    results['make_heat_map_seconds'] = seconds
+    seconds, html = measure(chart.to_html, repeat)
+    results['heat_map_to_html_seconds'] = seconds
+    results['heat_map_bytes'] = len(html)
+
+    seconds, _ = measure(lambda: app.make_bar_plot(day, shift, branch, 'sum(Total)', 'Total Sales', 'Sales in MMK'), repeat)
+    results['make_bar_plot_seconds'] = seconds
+    seconds, chart = measure(lambda: app.con_plt(day, shift, branch), repeat)
+    results['con_plt_seconds'] = seconds
+    seconds, html = measure(chart.to_html, repeat)
+    results['con_plt_to_html_seconds'] = seconds
+    results['con_plt_bytes'] = len(html)
+
+    if rows <= INLINE_MAX_ROWS:
+        # Altair refuses to embed more than 5,000 rows by default
+        alt.data_transformers.disable_max_rows()
+        seconds, html = measure(lambda: make_inline_heat_map(sales, branch, 'sum(Total)', 'Total Sales (MMK)').to_html(), repeat)
+        results['inline_heat_map_seconds'] = seconds
+        results['inline_heat_map_bytes'] = len(html)
+        seconds, html = measure(lambda: make_inline_bar_plots(sales, day, shift, branch).to_html(), repeat)
+        results['inline_con_plt_seconds'] = seconds
+        results['inline_con_plt_bytes'] = len(html)
+
+    client = app.server.test_client()
+    store = [('Store', 'value', branch), ('time_bucket', 'value', app.aggregate.SHIFT_MINUTES),
+             ('date_range', 'start_date', None), ('date_range', 'end_date', None)]
+    shift_inputs = [('day_of_week', 'value', day), ('time_of_day', 'value', shift)] + store
+    if app.SHARED_HEAT_MAPS:
+        heat_map_output = [('heat_maps', app.CHART_PROPERTY)]
+    else:
+        heat_map_output = [(kind, app.CHART_PROPERTY) for kind, _, _ in app.aggregate.HEAT_MAPS]
+
+    def cold_callback(output, inputs):
+        app.chart_cache.invalidate()
+        return post_callback(client, output, inputs)
+
+    seconds, body = measure(lambda: cold_callback(heat_map_output, store), repeat)
+    results['heat_map_callback_cold_seconds'] = seconds
+    results['heat_map_callback_bytes'] = len(body)
+    seconds, _ = measure(lambda: post_callback(client, heat_map_output, store), repeat)
+    results['heat_map_callback_warm_seconds'] = seconds
+
+    if not app.CLIENTSIDE_CHARTS:
+        bar_plot_output = [('bar_plots', app.CHART_PROPERTY)]
+        seconds, body = measure(lambda: cold_callback(bar_plot_output, shift_inputs), repeat)
+        results['bar_plot_callback_cold_seconds'] = seconds
+        results['bar_plot_callback_bytes'] = len(body)
+        seconds, _ = measure(lambda: post_callback(client, bar_plot_output, shift_inputs), repeat)
+        results['bar_plot_callback_warm_seconds'] = seconds
+
+    return results
+
+def find_regressions(results, baseline, tolerance):
+    """
+    List the timings that got slower than a previous run
+
+    Parameters
+    ----------
+    results: dict
+        maps the number of rows to the output of run
+    baseline: dict
+        the same structure from a previous run
+    tolerance: float
+        the allowed slowdown, e.g. 0.2 for 20%
+
+    Returns
+    -------
+    list of str
+        a description of every regression
+    """
+    regressions = []
+    for rows, measurements in results.items():
+        for name, value in measurements.items():
+            previous = baseline.get(rows, {}).get(name)
+            if previous and name.endswith('_seconds') and value > previous * (1 + tolerance):
+                regressions.append('{} rows {}: {:.4f}s vs {:.4f}s'.format(rows, name, value, previous))
+    return regressions
+
+def main(rows, repeat, output=None, baseline=None, tolerance=0.2, branches=None):
+    df = datastore.read_csv()
+    results = {}
+    for n in rows:
+        results[str(n)] = run(df, n, repeat, branches)
+        print('{} rows'.format(n))
+        for name, value in sorted(results[str(n)].items()):
+            print('  {:<36}{:>14.4f}'.format(name, value) if name.endswith('_seconds')
+                  else '  {:<36}{:>14,d}'.format(name, value))
+
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        with open(baseline) as f:
+            regressions = find_regressions(results, json.load(f), tolerance)
+        for regression in regressions:
+            print('Regression: ' + regression)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard hot paths')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='fail if slower than the results in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--branches', type=int,
+                        help='benchmark synthetic data with this many branches')
+    args = parser.parse_args()
+    main(args.rows, args.repeat, args.output, args.baseline, args.tolerance, args.branches)
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+import threading
+
+# Enough room for every heat map and bar plot state of three branches
+MAX_SIZE = 256
+
+_charts = OrderedDict()
+_rendering = {}
+_lock = threading.Lock()
+# Bumped whenever charts are dropped, so that renders of older data that
+# finish afterwards are not cached
+_generation = 0
+
+def get_html(key, render, max_size=MAX_SIZE):
+    """
+    Return the cached html of a chart, rendering it on a miss
+
+    Parameters
+    ----------
+    key: tuple
+        (chart kind, branch, day of week, time of day)
+    render: function
+        called without arguments to produce the html on a miss
+    max_size: int
+        the number of charts kept before evicting the least recently used
+
+    Returns
+    -------
+    str
+        the chart in html format
+    """
+    with _lock:
+        if key in _charts:
+            _charts.move_to_end(key)
+            return _charts[key]
+        # Let only one caller render a chart that several callbacks asked
+        # for at once, e.g. both comparison panels after a store change
+        rendering = _rendering.get(key)
+        if rendering is None:
+            rendering = _rendering[key] = threading.Event()
+            generation = _generation
+            is_owner = True
+        else:
+            is_owner = False
+
+    if not is_owner:
+        rendering.wait()
+        with _lock:
+            if key in _charts:
+                _charts.move_to_end(key)
+                return _charts[key]
+        # The owner failed or the chart was already evicted
+        return render()
+
+    # Render outside the lock so slow charts do not block cache hits
+    try:
+        html = render()
+        with _lock:
+            if generation == _generation:
+                _charts[key] = html
+                _charts.move_to_end(key)
+                while len(_charts) > max_size:
+                    _charts.popitem(last=False)
+    finally:
+        with _lock:
+            del _rendering[key]
+        rendering.set()
+    return html
+
+def invalidate(branch_index=None):
+    """
+    Drop cached charts after the source data changes
+
+    Parameters
+    ----------
+    branch_index: str
+        only drop the charts of this branch, or every chart if None
+    """
+    global _generation
+
+    with _lock:
+        _generation += 1
+        if branch_index is None:
+            _charts.clear()
+            return
+        for key in [key for key in _charts if key[1] == branch_index]:
+            del _charts[key]
+
+def discard(keys):
+    """
+    Drop the cached charts of the given keys only
+
+    Parameters
+    ----------
+    keys: list of tuple
+        (chart kind, branch, day of week, time of day)
+    """
+    global _generation
+
+    with _lock:
+        _generation += 1
+        for key in keys:
+            _charts.pop(key, None)
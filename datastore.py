@@ -0,0 +1,134 @@
+"""
+Load the cleaned sales data from a compact columnar store
+
+Run from the home directory with `python datastore.py` to write the
+cleaned CSV once to a Feather file. Workers then read that file on startup
+instead of parsing the CSV, and fall back to the CSV when the store is
+missing, stale or pyarrow is not installed. Each worker still holds its own
+copy of the columns, which the categorical and downcast dtypes keep small.
+"""
+import argparse
+import os
+
+import pandas as pd
+
+import aggregate
+from aggregate import DAYS, TIMES
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+CSV_PATH = 'data/supermarket_sales_clean.csv'
+STORE_PATH = 'data/supermarket_sales_clean.feather'
+
+CATEGORIES = ['Branch', 'City', 'Customer type', 'Gender', 'Product line', 'Payment']
+
+def compact(df):
+    """
+    Convert the cleaned data to categorical and compact numeric dtypes
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data as read from the CSV
+
+    Returns
+    -------
+    pandas DataFrame
+        the same data using less memory per row
+    """
+    df = df.copy()
+    df['Date_time'] = pd.to_datetime(df['Date_time'], format='%Y-%m-%d %H:%M:%S')
+    for column in CATEGORIES:
+        df[column] = df[column].astype('category')
+    df['Day_of_week'] = pd.Categorical(df['Day_of_week'], categories=DAYS)
+    df['Time_of_day'] = pd.Categorical(df['Time_of_day'], categories=TIMES)
+    df['Quantity'] = pd.to_numeric(df['Quantity'], downcast='integer')
+    df['Minute_of_day'] = aggregate.get_minute_of_day(df).astype('int16')
+    return df
+
+def read_csv(csv_path=CSV_PATH):
+    """
+    Read the cleaned CSV into compact dtypes
+
+    Parameters
+    ----------
+    csv_path: str
+        the path to the cleaned CSV
+
+    Returns
+    -------
+    pandas DataFrame
+        the cleaned supermarket sales data
+    """
+    return compact(pd.read_csv(csv_path))
+
+def is_fresh(csv_path=CSV_PATH, store_path=STORE_PATH):
+    """
+    Check whether the store was written after the CSV last changed
+
+    Parameters
+    ----------
+    csv_path: str
+        the path to the cleaned CSV
+    store_path: str
+        the path to the Feather file
+
+    Returns
+    -------
+    bool
+        True if the store can be read instead of the CSV
+    """
+    if feather is None or not os.path.exists(store_path):
+        return False
+    return os.path.getmtime(store_path) >= os.path.getmtime(csv_path)
+
+def write_store(csv_path=CSV_PATH, store_path=STORE_PATH):
+    """
+    Write the cleaned CSV to an uncompressed Feather file
+
+    Parameters
+    ----------
+    csv_path: str
+        the path to the cleaned CSV
+    store_path: str
+        the path to the Feather file
+    """
+    if feather is None:
+        raise ImportError('pyarrow is required to write the data store')
+
+    # Write next to the store and rename so workers never see a partial file
+    tmp_path = store_path + '.tmp'
+    feather.write_feather(read_csv(csv_path), tmp_path, compression='uncompressed')
+    os.replace(tmp_path, store_path)
+
+def load(csv_path=CSV_PATH, store_path=STORE_PATH):
+    """
+    Load the cleaned data, reading the store when it is fresh
+
+    Parameters
+    ----------
+    csv_path: str
+        the path to the cleaned CSV
+    store_path: str
+        the path to the Feather file
+
+    Returns
+    -------
+    pandas DataFrame
+        the cleaned supermarket sales data
+    """
+    if is_fresh(csv_path, store_path):
+        # The map only saves a read buffer, to_pandas copies every column
+        return feather.read_table(store_path, memory_map=True).to_pandas()
+    return read_csv(csv_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write the cleaned data to a Feather file')
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--store', default=STORE_PATH)
+    args = parser.parse_args()
+    write_store(args.csv, args.store)
+    print('Wrote {} to {}'.format(args.csv, args.store))
@@ -0,0 +1,168 @@
+"""
+Plotly versions of the dashboard charts for rendering with dcc.Graph
+
+Dash sends these figures as JSON and redraws them in place, instead of
+replacing an iframe document that has to reload vega on every update.
+"""
+import math
+
+import plotly.graph_objs as go
+from plotly.subplots import make_subplots
+
+import aggregate
+
+# The default template adds several kilobytes to every figure sent to the
+# browser, so start from an empty one
+TEMPLATE = 'none'
+
+def make_heat_map_figure(cells, func, plot_title):
+    """
+    Make a heat map by day of week and time of day
+
+    Parameters
+    ----------
+    cells: pandas DataFrame
+        the heat map cells of one branch
+    func: str
+        the metric to be associated with the color
+    plot_title: str
+        the name to be used as title
+
+    Returns
+    -------
+    plotly Figure
+        a heat map
+    """
+    field = aggregate.METRICS[func]
+    # Shifts or finer time buckets, in the order of the cells
+    times = list(cells['Time_of_day'].unique())
+    grid = (cells
+            .pivot(index='Time_of_day', columns='Day_of_week', values=field)
+            .reindex(index=times, columns=aggregate.DAYS))
+
+    figure = go.Figure(go.Heatmap(
+        z=grid.values,
+        x=aggregate.DAYS,
+        y=times,
+        colorscale='Greens',
+        hovertemplate='%{x} %{y}<br>' + plot_title + ': %{z:,.0f}<extra></extra>'))
+    figure.update_layout(template=TEMPLATE,
+                         title=plot_title,
+                         width=370,
+                         height=max(300, 6 * len(times) + 170),
+                         margin=dict(l=80, r=20, t=40, b=80),
+                         xaxis=dict(tickangle=45),
+                         yaxis=dict(autorange='reversed'))
+    return figure
+
+def make_bar_plots_figure(cells):
+    """
+    Make the bar plots of every metric side by side
+
+    Parameters
+    ----------
+    cells: pandas DataFrame
+        the product line metrics of one branch, day and time
+
+    Returns
+    -------
+    plotly Figure
+        four bar plots
+    """
+    figure = make_subplots(rows=1, cols=len(aggregate.BAR_PLOTS),
+                           subplot_titles=[plot_title for _, plot_title, _ in aggregate.BAR_PLOTS])
+    for col, (func, plot_title, y_title) in enumerate(aggregate.BAR_PLOTS, start=1):
+        figure.add_trace(go.Bar(x=cells['Product line'],
+                                y=cells[aggregate.METRICS[func]],
+                                marker_color='cornflowerblue',
+                                hovertemplate='%{x}<br>' + plot_title + ': %{y:,.2f}<extra></extra>'),
+                         row=1, col=col)
+        figure.update_yaxes(title_text=y_title, row=1, col=col)
+    figure.update_xaxes(tickangle=45)
+    figure.update_layout(template=TEMPLATE, showlegend=False, width=1500, height=400)
+    return figure
+
+def make_bar_plot_data(tables, branch_index, times=aggregate.TIMES):
+    """
+    Collect the bar plots of every day and time of one branch for slicing
+    in the browser by assets/clientside.js
+
+    Parameters
+    ----------
+    tables: dict
+        the bar plot tables from aggregate.make_bar_plot_tables
+    branch_index: str
+        the character used to represent the supermarket branch
+    times: list of str
+        the shifts or finer time buckets of the tables
+
+    Returns
+    -------
+    dict
+        an empty bar plots figure, the product lines, the time buckets and
+        the values of each metric by day of week and time of day
+    """
+    cells = tables[(branch_index, aggregate.DAYS[0], times[0])]
+    figure = make_bar_plots_figure(cells)
+    fields = [aggregate.METRICS[func] for func, _, _ in aggregate.BAR_PLOTS]
+
+    def to_list(values):
+        # Missing averages become null rather than invalid JSON
+        return [None if value != value else value for value in values.tolist()]
+
+    return {
+        'figure': figure.to_plotly_json(),
+        'product_lines': list(cells['Product line']),
+        'times': list(times),
+        'cells': {day: {time: [to_list(tables[(branch_index, day, time)][field])
+                               for field in fields]
+                        for time in times}
+                  for day in aggregate.DAYS}
+    }
+
+def make_store_comparison_figure(cells, labels, plot_title, delta=False):
+    """
+    Make heat maps of one metric for several branches side by side
+
+    Parameters
+    ----------
+    cells: pandas DataFrame
+        the output of aggregate.make_comparison_cells
+    labels: list of str
+        the name of each branch, in the order of cells
+    plot_title: str
+        the name to be used as title
+    delta: bool
+        whether cells hold differences from the chain average
+
+    Returns
+    -------
+    plotly Figure
+        heat maps sharing one color scale, four per row
+    """
+    columns = 4
+    rows = math.ceil(len(labels) / columns)
+    figure = make_subplots(rows=rows, cols=columns, subplot_titles=labels,
+                           shared_xaxes=True, shared_yaxes=True)
+    grids = (cells
+             .pivot_table(index=['Branch', 'Time_of_day'], columns='Day_of_week', values='value',
+                          dropna=False, observed=False))
+    for i, branch in enumerate(cells['Branch'].unique()):
+        grid = grids.loc[branch].reindex(index=aggregate.TIMES, columns=aggregate.DAYS)
+        figure.add_trace(go.Heatmap(z=grid.values, x=aggregate.DAYS, y=aggregate.TIMES,
+                                    coloraxis='coloraxis',
+                                    hovertemplate=labels[i] + '<br>%{x} %{y}<br>' + plot_title
+                                                  + (': %{z:,.2f}' if delta else ': %{z:,.0f}')
+                                                  + '<extra></extra>'),
+                         row=i // columns + 1, col=i % columns + 1)
+
+    if delta:
+        limit = cells['value'].abs().max()
+        coloraxis = dict(colorscale='RdBu', cmin=-limit, cmax=limit)
+        plot_title += ' vs Chain Average'
+    else:
+        coloraxis = dict(colorscale='Greens')
+    figure.update_yaxes(autorange='reversed')
+    figure.update_layout(template=TEMPLATE, title=plot_title, coloraxis=coloraxis,
+                         width=1500, height=250 * rows + 100)
+    return figure
@@ -0,0 +1,177 @@
+"""
+Forecast customer traffic and sales by branch, day of week and time of day
+
+Every branch gets a seasonal model: a linear trend of its weekly totals,
+split over the day of week by time of day grid by the share each cell had
+of the weekly totals so far. Both parts are fitted with array operations
+over every branch and metric at once, so retraining hundreds of stores
+takes well under a second. Run from the home directory with
+`python forecast.py --weeks 4 --output data/forecast.csv` to write the
+forecasts of the next weeks, e.g. from a nightly job.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import aggregate
+import datastore
+from aggregate import DAYS, TIMES
+
+# (additive sum, forecast column) of every forecast metric
+FORECASTS = [('count', 'customer_traffic'), ('total', 'total_sales')]
+
+# (metric, title) of the forecast heat maps
+FORECAST_HEAT_MAPS = [
+    ('count(Invoice ID)', 'Forecast Customer Traffic'),
+    ('sum(Total)', 'Forecast Total Sales (MMK)')
+]
+
+def make_weekly_series(daily):
+    """
+    Arrange the daily sums as weekly series of every branch and cell
+
+    Parameters
+    ----------
+    daily: pandas DataFrame
+        the output of aggregate.make_daily_sums
+
+    Returns
+    -------
+    dict
+        the sums of every complete week, branch, day of week, time of day and
+        metric of FORECASTS as an array, the number of each of those weeks,
+        the number of the last week with sales, the Monday of week 0 and the
+        branches
+    """
+    dates = daily.index.unique(level='Date')
+    branches = list(daily.index.unique(level='Branch'))
+    columns = [column for column, _ in FORECASTS]
+    sums = (daily[columns]
+            .groupby(level=['Date', 'Branch', 'Time_of_day'], sort=False)
+            .sum()
+            .values
+            .reshape(len(dates), len(branches), len(TIMES), len(columns)))
+
+    # Number the weeks from the Monday on or before the first date
+    days = aggregate.get_day_numbers(dates)
+    first_monday = days[0] - dates[0].dayofweek
+    weeks = (days - first_monday) // 7
+    series = np.zeros((weeks[-1] + 1, len(branches), len(DAYS), len(TIMES), len(columns)))
+    series[weeks, :, dates.dayofweek.values] = sums
+
+    # Only weeks with sales on all seven days show the whole weekly pattern
+    complete = np.flatnonzero(np.bincount(weeks) == len(DAYS))
+    if not len(complete):
+        complete = np.unique(weeks)
+    return {
+        'series': series[complete],
+        'weeks': complete,
+        'last_week': weeks[-1],
+        'first_monday': pd.Timestamp(first_monday, unit='D'),
+        'branches': branches
+    }
+
+def fit(weekly):
+    """
+    Fit the trend and seasonal shares of every branch at once
+
+    Parameters
+    ----------
+    weekly: dict
+        the output of make_weekly_series
+
+    Returns
+    -------
+    dict
+        the intercept and slope of the weekly totals of every branch and
+        metric, the share of every cell in them, and the weeks and branches
+        of the data
+    """
+    series = weekly['series']
+    weeks, branches, _, _, metrics = series.shape
+    totals = series.sum(axis=(2, 3)).reshape(weeks, -1)
+
+    # One least squares solve fits the line of every branch and metric
+    if weeks > 1:
+        design = np.column_stack([np.ones(weeks), weekly['weeks']])
+        coefficients = np.linalg.lstsq(design, totals, rcond=None)[0]
+    else:
+        coefficients = np.vstack([totals.mean(axis=0), np.zeros(totals.shape[1])])
+
+    cells = series.sum(axis=0)
+    weekly_totals = cells.sum(axis=(1, 2), keepdims=True)
+    shares = np.divide(cells, weekly_totals, out=np.zeros_like(cells), where=weekly_totals > 0)
+    return {
+        'intercept': coefficients[0].reshape(branches, metrics),
+        'slope': coefficients[1].reshape(branches, metrics),
+        'shares': shares,
+        'last_week': weekly['last_week'],
+        'first_monday': weekly['first_monday'],
+        'branches': weekly['branches']
+    }
+
+def get_week_start(model, weeks_ahead=1):
+    """
+    Get the Monday of a forecast week
+
+    Parameters
+    ----------
+    model: dict
+        the output of fit
+    weeks_ahead: int
+        1 for the week after the last sales, 2 for the one after and so on
+
+    Returns
+    -------
+    pandas Timestamp
+        the first day of the week
+    """
+    return model['first_monday'] + pd.Timedelta(weeks=int(model['last_week']) + weeks_ahead)
+
+def predict(model, weeks_ahead=1):
+    """
+    Forecast one week of traffic and sales of every branch and cell
+
+    Parameters
+    ----------
+    model: dict
+        the output of fit
+    weeks_ahead: int
+        1 for the week after the last sales, 2 for the one after and so on
+
+    Returns
+    -------
+    pandas DataFrame
+        customer traffic and total sales indexed by Branch, Day_of_week and
+        Time_of_day
+    """
+    week = model['last_week'] + weeks_ahead
+    totals = np.maximum(model['intercept'] + model['slope'] * week, 0)
+    values = model['shares'] * totals[:, None, None, :]
+
+    index = pd.MultiIndex.from_product([model['branches'], DAYS, TIMES], names=aggregate.CUBE_KEYS[:3])
+    return pd.DataFrame(values.reshape(-1, len(FORECASTS)), index=index,
+                        columns=[column for _, column in FORECASTS])
+
+def main(weeks, output):
+    df = datastore.load()
+    cube = aggregate.make_cube(df)
+    daily = aggregate.make_daily_sums(df, list(cube.index.unique(level='Branch')),
+                                      list(cube.index.unique(level='Product line')))
+    model = fit(make_weekly_series(daily))
+
+    forecasts = []
+    for weeks_ahead in range(1, weeks + 1):
+        forecast = predict(model, weeks_ahead)
+        forecast.insert(0, 'Week', get_week_start(model, weeks_ahead))
+        forecasts.append(forecast)
+    pd.concat(forecasts).to_csv(output)
+    print('Wrote {} weeks of forecasts for {} branches to {}'.format(weeks, len(model['branches']), output))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Forecast traffic and sales by branch, day and time of day')
+    parser.add_argument('--weeks', type=int, default=4)
+    parser.add_argument('--output', default='data/forecast.csv')
+    args = parser.parse_args()
+    main(args.weeks, args.output)
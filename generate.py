@@ -0,0 +1,191 @@
+"""
+Generate synthetic supermarket sales for scale testing
+
+Run from the home directory with e.g.
+`python generate.py data/synthetic_sales.csv --rows 100000000 --branches 300`
+to write sales with the columns of data/supermarket_sales.csv, or pass
+`--clean` for the columns of data/supermarket_sales_clean.csv. Every
+column is generated with vectorized NumPy in batches of `--chunksize`.
+"""
+import argparse
+import string
+
+import numpy as np
+import pandas as pd
+
+import ingest
+
+CITIES = ['Yangon', 'Mandalay', 'Naypyitaw']
+PRODUCT_LINES = ['Electronic accessories', 'Fashion accessories', 'Food and beverages',
+                 'Health and beauty', 'Home and lifestyle', 'Sports and travel']
+CUSTOMER_TYPES = ['Member', 'Normal']
+GENDERS = ['Female', 'Male']
+PAYMENTS = ['Cash', 'Credit card', 'Ewallet']
+
+# Opening hours of the sample data, 10:00 to 20:59
+FIRST_MINUTE = 10 * 60
+LAST_MINUTE = 21 * 60
+
+# Spread invoice numbers over 9 digits without repeats, since this is
+# coprime with 10**9
+INVOICE_STEP = 387420489
+
+def make_branches(n):
+    """
+    Name branches A to Z, then AA, AB and so on
+
+    Parameters
+    ----------
+    n: int
+        the number of branches
+
+    Returns
+    -------
+    tuple
+        the list of branch characters and the list of their cities
+    """
+    letters = string.ascii_uppercase
+    branches = []
+    size = 1
+    while len(branches) < n:
+        codes = np.indices([len(letters)] * size).reshape(size, -1).T
+        branches += [''.join(letters[c] for c in code) for code in codes]
+        size += 1
+    branches = branches[:n]
+    cities = [CITIES[i] if i < len(CITIES) else 'City ' + branch
+              for i, branch in enumerate(branches)]
+    return branches, cities
+
+def make_product_lines(n):
+    """
+    Name product lines, starting with those of the sample data
+
+    Parameters
+    ----------
+    n: int
+        the number of product lines
+
+    Returns
+    -------
+    list of str
+        the product lines
+    """
+    return (PRODUCT_LINES + ['Product line {}'.format(i + 1) for i in range(len(PRODUCT_LINES), n)])[:n]
+
+def format_invoice_ids(numbers):
+    """
+    Format 9 digit numbers as invoice ids like 750-67-8428
+
+    Parameters
+    ----------
+    numbers: numpy array
+        integers below 10**9
+
+    Returns
+    -------
+    numpy array
+        the invoice ids as strings
+    """
+    digits = (numbers[:, None] // 10 ** np.arange(8, -1, -1)) % 10 + ord('0')
+    chars = np.full((len(numbers), 11), ord('-'), dtype=np.uint8)
+    chars[:, [0, 1, 2, 4, 5, 7, 8, 9, 10]] = digits
+    return chars.view('S11').ravel().astype(str)
+
+def generate(rows, branches=3, product_lines=6, start='2019-01-01', end='2019-03-30',
+             seed=0, first_invoice=0, clean=False):
+    """
+    Generate raw sales with the columns of data/supermarket_sales.csv
+
+    Parameters
+    ----------
+    rows: int
+        the number of transactions
+    branches: int
+        the number of branches
+    product_lines: int
+        the number of product lines
+    start: str
+        the first date of sales
+    end: str
+        the last date of sales
+    seed: int
+        the random seed
+    first_invoice: int
+        the position of the first invoice, so that batches do not share ids
+    clean: bool
+        return the columns of data/supermarket_sales_clean.csv instead
+
+    Returns
+    -------
+    pandas DataFrame
+        the synthetic sales
+    """
+    rng = np.random.default_rng(seed)
+    branch_names, city_names = make_branches(branches)
+    product_names = make_product_lines(product_lines)
+    dates = pd.date_range(start, end, freq='D')
+    minutes = np.arange(FIRST_MINUTE, LAST_MINUTE)
+
+    # Format every possible date and time once and store them as categories
+    date_strings = ['{}/{}/{}'.format(d.month, d.day, d.year) for d in dates]
+    time_strings = ['{:02d}:{:02d}'.format(m // 60, m % 60) for m in minutes]
+
+    branch = rng.integers(0, branches, rows)
+    day = rng.integers(0, len(dates), rows)
+    minute = rng.integers(0, len(minutes), rows)
+    unit_price = np.round(rng.uniform(10, 100, rows), 2)
+    quantity = rng.integers(1, 11, rows)
+    cogs = np.round(unit_price * quantity, 2)
+    tax = cogs * 0.05
+
+    invoice_numbers = (np.arange(first_invoice, first_invoice + rows, dtype=np.int64) * INVOICE_STEP) % 10 ** 9
+
+    df = pd.DataFrame({
+        'Invoice ID': format_invoice_ids(invoice_numbers),
+        'Branch': pd.Categorical.from_codes(branch, categories=branch_names),
+        'City': pd.Categorical.from_codes(branch, categories=city_names),
+        'Customer type': pd.Categorical.from_codes(rng.integers(0, 2, rows), categories=CUSTOMER_TYPES),
+        'Gender': pd.Categorical.from_codes(rng.integers(0, 2, rows), categories=GENDERS),
+        'Product line': pd.Categorical.from_codes(rng.integers(0, product_lines, rows), categories=product_names),
+        'Unit price': unit_price,
+        'Quantity': quantity,
+        'Tax 5%': tax,
+        'Total': cogs + tax,
+        'Date': pd.Categorical.from_codes(day, categories=date_strings),
+        'Time': pd.Categorical.from_codes(minute, categories=time_strings),
+        'Payment': pd.Categorical.from_codes(rng.integers(0, 3, rows), categories=PAYMENTS),
+        'cogs': cogs,
+        'gross margin percentage': 100 / 21,
+        'gross income': tax,
+        'Rating': np.round(rng.uniform(4, 10, rows), 1)
+    })
+    if not clean:
+        return df
+
+    # Build Date_time from the codes rather than parsing the strings
+    df = df.drop(columns=['Date', 'Time'])
+    df.insert(0, 'Date_time', dates.values[day] + minutes[minute].astype('timedelta64[m]'))
+    return ingest.add_day_and_time(df)
+
+def main(path, rows, chunksize=1000000, seed=0, **kwargs):
+    for i, first in enumerate(range(0, rows, chunksize)):
+        chunk = generate(min(chunksize, rows - first), seed=seed + i, first_invoice=first, **kwargs)
+        chunk.to_csv(path, index=False, header=(first == 0), mode='w' if first == 0 else 'a')
+    print('Wrote {} transactions to {}'.format(rows, path))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic supermarket sales')
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--branches', type=int, default=3)
+    parser.add_argument('--product-lines', type=int, default=6)
+    parser.add_argument('--start', default='2019-01-01')
+    parser.add_argument('--end', default='2019-03-30')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=1000000)
+    parser.add_argument('--clean', action='store_true',
+                        help='write the columns of the cleaned data instead of the raw data')
+    args = parser.parse_args()
+    main(args.path, args.rows, args.chunksize, args.seed,
+         branches=args.branches, product_lines=args.product_lines,
+         start=args.start, end=args.end, clean=args.clean)
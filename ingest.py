@@ -0,0 +1,177 @@
+"""
+Clean a raw supermarket sales export in a single vectorized pass
+
+Run from the home directory with
+`python ingest.py data/supermarket_sales.csv data/supermarket_sales_clean.csv`
+to derive Day_of_week and Time_of_day for every transaction without
+copying the data once per time of day. Pass `--chunksize` to process
+exports larger than memory batch by batch, and `--cube` to also write the
+branch, day, time and product line aggregates.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import aggregate
+from aggregate import DAYS, TIMES
+from datastore import CATEGORIES
+
+# Morning is 9:00-12:59, Afternoon is 13:00-16:59 and Evening is 17:00-20:59
+TIME_BINS = [9, 13, 17, 21]
+
+DATE_FORMAT = '%m/%d/%Y'
+TIME_FORMAT = '%H:%M'
+
+def add_day_and_time(df):
+    """
+    Derive Day_of_week and Time_of_day from Date_time
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        sales data with a datetime Date_time column, modified in place
+
+    Returns
+    -------
+    pandas DataFrame
+        the same data with categorical Day_of_week and Time_of_day columns,
+        where Time_of_day is missing outside of business hours, and an
+        integer Minute_of_day column for finer time buckets
+    """
+    date_time = df['Date_time'].dt
+    # dayofweek counts from Monday = 0, the same order as DAYS
+    df['Day_of_week'] = pd.Categorical.from_codes(date_time.dayofweek, categories=DAYS)
+    df['Time_of_day'] = pd.cut(date_time.hour, bins=TIME_BINS, right=False, labels=TIMES)
+    df['Minute_of_day'] = (date_time.hour * 60 + date_time.minute).astype('int16')
+    return df
+
+def parse_distinct(values, fmt):
+    """
+    Parse a column of dates or times once per distinct value
+
+    Exports repeat a few hundred dates and times over millions of rows, so
+    parsing the distinct values and taking them by code avoids formatting
+    and parsing a string per row.
+
+    Parameters
+    ----------
+    values: pandas Series
+        the dates or times as text or categories
+    fmt: str
+        the strptime format of the values
+
+    Returns
+    -------
+    numpy array
+        the parsed values as datetime64, NaT where values are missing
+    """
+    codes = pd.Categorical(values)
+    parsed = pd.to_datetime(codes.categories.astype(str), format=fmt).values
+    return np.where(codes.codes >= 0, parsed[codes.codes], np.datetime64('NaT'))
+
+def clean(raw):
+    """
+    Turn raw sales into the cleaned data used by the dashboard
+
+    Parameters
+    ----------
+    raw: pandas DataFrame
+        sales data with the columns of data/supermarket_sales.csv
+
+    Returns
+    -------
+    pandas DataFrame
+        sales data with the columns of data/supermarket_sales_clean.csv
+    """
+    # Times parse onto 1900-01-01, keep only their offset from midnight
+    time_of_day = parse_distinct(raw['Time'], TIME_FORMAT) - np.datetime64('1900-01-01')
+    date_time = pd.Series(parse_distinct(raw['Date'], DATE_FORMAT) + time_of_day, index=raw.index)
+    df = raw.drop(columns=['Date', 'Time'])
+    df.insert(0, 'Date_time', date_time)
+    return add_day_and_time(df)
+
+def read_raw(path, **kwargs):
+    """
+    Read a raw sales export with categorical text columns
+
+    Parameters
+    ----------
+    path: str
+        the path to the raw CSV
+    **kwargs
+        passed on to pd.read_csv, e.g. chunksize
+
+    Returns
+    -------
+    pandas DataFrame or iterator of pandas DataFrame
+        the raw sales data
+    """
+    dtype = {column: 'category' for column in CATEGORIES}
+    return pd.read_csv(path, dtype=dtype, **kwargs)
+
+def clean_chunks(raw_path, clean_path, chunksize):
+    """
+    Clean a raw export batch by batch and aggregate it along the way
+
+    Parameters
+    ----------
+    raw_path: str
+        the path to the raw CSV
+    clean_path: str
+        the path to write the cleaned CSV to, or None to only aggregate
+    chunksize: int
+        the number of transactions held in memory at once
+
+    Returns
+    -------
+    tuple
+        the cube sums over every branch, day of week, time of day and
+        product line, the number of transactions and the number of
+        transactions outside of business hours
+    """
+    sums = None
+    rows = 0
+    outside_hours = 0
+    for chunk in read_raw(raw_path, chunksize=chunksize):
+        df = clean(chunk)
+        if clean_path is not None:
+            df.to_csv(clean_path, index=False, header=(rows == 0), mode='w' if rows == 0 else 'a')
+
+        # Aggregate only the keys seen in this batch and fill the rest at the end
+        sums = aggregate.add_sums(sums, aggregate.make_batch_cube(df))
+        rows += len(df)
+        outside_hours += df['Time_of_day'].isna().sum()
+
+    if sums is None:
+        # A header only export has no chunks, aggregate it as an empty one
+        sums = aggregate.make_batch_cube(clean(read_raw(raw_path, nrows=0)))
+    return aggregate.fill_cube(sums), rows, outside_hours
+
+def main(raw_path, clean_path, chunksize=None, cube_path=None):
+    if chunksize is None:
+        df = clean(read_raw(raw_path))
+        df.to_csv(clean_path, index=False)
+        rows = len(df)
+        outside_hours = df['Time_of_day'].isna().sum()
+        cube = aggregate.make_cube(df) if cube_path is not None else None
+    else:
+        cube, rows, outside_hours = clean_chunks(raw_path, clean_path, chunksize)
+
+    if outside_hours:
+        print('{} transactions fall outside of business hours'.format(outside_hours))
+    print('Wrote {} transactions to {}'.format(rows, clean_path))
+    if cube_path is not None:
+        cube.to_csv(cube_path)
+        print('Wrote the aggregates to {}'.format(cube_path))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Clean a raw supermarket sales export')
+    parser.add_argument('raw_path')
+    parser.add_argument('clean_path')
+    parser.add_argument('--chunksize', type=int,
+                        help='clean this many transactions at a time to bound memory')
+    parser.add_argument('--cube', dest='cube_path',
+                        help='also write the branch, day, time and product line sums here')
+    args = parser.parse_args()
+    main(args.raw_path, args.clean_path, args.chunksize, args.cube_path)
@@ -0,0 +1,181 @@
+"""
+Opt-in performance instrumentation for the dashboard
+
+Set INSTRUMENT=1 to time the phases of every chart build, record the
+latency and payload size of every Dash callback, log one JSON line per
+callback and serve the running totals as JSON at /metrics.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from flask import g, has_request_context, jsonify, request
+
+ENABLED = os.environ.get('INSTRUMENT') == '1'
+
+logger = logging.getLogger('dashboard.metrics')
+
+_stats = {}
+_lock = threading.Lock()
+# The phases of the request a worker thread is helping with
+_local = threading.local()
+
+def record(name, value):
+    """
+    Add a measurement to the running totals
+
+    Parameters
+    ----------
+    name: str
+        the name of the measurement, e.g. build:bar_plots
+    value: float
+        seconds for timings, bytes for sizes or 1 for counts
+    """
+    with _lock:
+        stat = _stats.get(name)
+        if stat is None:
+            stat = _stats[name] = {'count': 0, 'total': 0.0, 'max': 0.0}
+        stat['count'] += 1
+        stat['total'] += value
+        stat['max'] = max(stat['max'], value)
+
+class timed(object):
+    """
+    Time a block of code as one phase of the current request
+
+    Parameters
+    ----------
+    phase: str
+        the name of the phase, e.g. serialize:total_sales
+    """
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        if ENABLED:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if not ENABLED:
+            return False
+        elapsed = time.perf_counter() - self.start
+        record(self.phase, elapsed)
+        phases = get_phases()
+        if phases is not None:
+            with _lock:
+                phases[self.phase] = phases.get(self.phase, 0) + elapsed
+        return False
+
+def get_phases():
+    """
+    Find the phase timings of the request the current thread works for
+
+    Returns
+    -------
+    dict
+        maps each phase to its seconds so far, or None outside a request
+    """
+    if has_request_context():
+        return getattr(g, 'phases', None)
+    return getattr(_local, 'phases', None)
+
+def in_request(function):
+    """
+    Let a function called on another thread time phases of this request
+
+    Phases that run side by side on several threads add up, so their sum
+    can exceed the latency of the callback.
+
+    Parameters
+    ----------
+    function: function
+        the function to call on the other thread
+
+    Returns
+    -------
+    function
+        the function, recording its phases into the current request
+    """
+    phases = get_phases() if ENABLED else None
+    if phases is None:
+        return function
+
+    def call(*args, **kwargs):
+        _local.phases = phases
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _local.phases = None
+    return call
+
+def count(name):
+    """
+    Count an event such as a chart cache miss
+
+    Parameters
+    ----------
+    name: str
+        the name of the event
+    """
+    if ENABLED:
+        record(name, 1)
+
+def get_metrics():
+    """
+    Summarize every measurement recorded so far
+
+    Returns
+    -------
+    dict
+        maps each measurement to its count, total, mean and max
+    """
+    with _lock:
+        return {name: dict(stat, mean=stat['total'] / stat['count'])
+                for name, stat in sorted(_stats.items())}
+
+def init_app(server):
+    """
+    Measure the Dash callbacks of a Flask server and serve /metrics
+
+    Parameters
+    ----------
+    server: Flask app
+        the server of the Dash app
+    """
+    if not ENABLED:
+        return
+
+    # Nothing else configures logging, so write the JSON lines to stderr
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.propagate = False
+
+    @server.before_request
+    def start_timer():
+        g.start = time.perf_counter()
+        g.phases = {}
+
+    @server.after_request
+    def record_callback(response):
+        if not request.path.endswith('_dash-update-component'):
+            return response
+
+        elapsed = time.perf_counter() - g.start
+        output = (request.get_json(silent=True) or {}).get('output', 'unknown')
+        size = response.calculate_content_length() or 0
+        record('callback:' + output, elapsed)
+        record('bytes:' + output, size)
+        logger.info(json.dumps({'callback': output,
+                                'seconds': round(elapsed, 6),
+                                'bytes': size,
+                                'phases': {phase: round(seconds, 6)
+                                           for phase, seconds in g.phases.items()}}))
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return jsonify(get_metrics())
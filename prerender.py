@@ -0,0 +1,151 @@
+"""
+Pre-render every dashboard chart to static html files
+
+Run from the home directory with `python prerender.py`. The app serves
+these files instead of building the charts at request time, as long as
+the data they were rendered from has not changed since.
+"""
+import argparse
+import json
+import os
+
+BUILD_DIR = 'build/charts'
+MANIFEST = 'manifest.json'
+
+def stamp_file(path):
+    """
+    Fingerprint a data file so stale charts are never served
+
+    A rewrite of the file changes its modification time, so checking the
+    stamp costs every worker one stat call rather than reading the file.
+
+    Parameters
+    ----------
+    path: str
+        the path to the data file
+
+    Returns
+    -------
+    list
+        the size of the file in bytes and its modification time in
+        nanoseconds
+    """
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def get_file_name(key):
+    """
+    Name the html file of a chart cache key
+
+    Parameters
+    ----------
+    key: tuple
+        (chart kind, branch, day of week, time of day)
+
+    Returns
+    -------
+    str
+        e.g. total_sales_A.html or bar_plots_A_Monday_Morning.html
+    """
+    return '_'.join(part for part in key if part is not None) + '.html'
+
+def load_manifest(data_path, build_dir=BUILD_DIR):
+    """
+    Find the pre-rendered charts that match the current data
+
+    Parameters
+    ----------
+    data_path: str
+        the path to the data file the app is serving
+    build_dir: str
+        the directory written by this script
+
+    Returns
+    -------
+    dict
+        maps file names to paths, empty if nothing matches the data
+    """
+    manifest_path = os.path.join(build_dir, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return {}
+
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('data') != stamp_file(data_path):
+        return {}
+    return {name: os.path.join(build_dir, name) for name in manifest['charts']}
+
+def read_html(charts, key):
+    """
+    Read a pre-rendered chart
+
+    Parameters
+    ----------
+    charts: dict
+        the output of load_manifest
+    key: tuple
+        (chart kind, branch, day of week, time of day)
+
+    Returns
+    -------
+    str
+        the chart in html format, or None if it was not pre-rendered
+    """
+    path = charts.get(get_file_name(key))
+    if path is None:
+        return None
+    with open(path) as f:
+        return f.read()
+
+def get_keys(branches, days, times):
+    """
+    List the cache key of every dashboard state
+
+    Parameters
+    ----------
+    branches: list of str
+        the characters used to represent the supermarket branches
+    days: list of str
+        the days of week
+    times: list of str
+        the times of day
+
+    Returns
+    -------
+    list of tuple
+        (chart kind, branch, day of week, time of day)
+    """
+    heat_map_kinds = ['total_sales', 'customer_traffic', 'transaction_size',
+                      'customer_satisfaction', 'heat_maps']
+    keys = []
+    for branch in branches:
+        keys += [(kind, branch, None, None) for kind in heat_map_kinds]
+        keys += [('bar_plots', branch, day, time) for day in days for time in times]
+    return keys
+
+def main(build_dir=BUILD_DIR):
+    # Import here so loading a manifest does not require the app
+    # Every chart is rendered below, a background warm-up would only compete
+    os.environ.setdefault('WARM_CACHE', '0')
+    import app
+
+    # Always render from the chart functions, never from a previous build
+    app.prerendered = {}
+    os.makedirs(build_dir, exist_ok=True)
+    branches = sorted(app.heat_map_tables)
+    charts = []
+    for key in get_keys(branches, app.aggregate.DAYS, app.aggregate.TIMES):
+        name = get_file_name(key)
+        with open(os.path.join(build_dir, name), 'w') as f:
+            f.write(app.get_chart_html(*key))
+        charts.append(name)
+
+    # Write the manifest last so a partial build is never served
+    with open(os.path.join(build_dir, MANIFEST), 'w') as f:
+        json.dump({'data': stamp_file(app.DATA_PATH), 'charts': charts}, f)
+    print('Pre-rendered {} charts to {}'.format(len(charts), build_dir))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Pre-render every dashboard chart')
+    parser.add_argument('--build-dir', default=BUILD_DIR)
+    main(parser.parse_args().build_dir)
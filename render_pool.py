@@ -0,0 +1,98 @@
+"""
+Optional process pool for rendering independent charts in parallel
+
+Set RENDER_WORKERS to the number of cores to build and serialize Altair
+charts in that many worker processes instead of in the request thread.
+Building a chart and calling to_html is pure Python work bound by the GIL,
+so the four heat maps of a store and the two bar plot panels only render
+side by side in separate processes. The workers are forked, so this mode
+needs a POSIX host. Call start once the chart builders are defined and
+before any other thread runs. A process forked while another thread holds
+a lock, e.g. of the chart cache or of logging, can deadlock on it.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import os
+import threading
+
+import instrument
+
+WORKERS = int(os.environ.get('RENDER_WORKERS', '0'))
+ENABLED = WORKERS > 1
+
+_processes = None
+_threads = None
+_lock = threading.Lock()
+
+def start():
+    """
+    Fork every worker process now, while the caller is the only thread
+    """
+    if not ENABLED:
+        return
+    processes, _ = get_executors()
+    # The first job forks all the workers of a fork context pool at once
+    processes.submit(int).result()
+
+def get_executors():
+    """
+    Create the worker processes and the threads that wait on them once
+
+    Returns
+    -------
+    tuple
+        the process pool and the thread pool
+    """
+    global _processes, _threads
+
+    with _lock:
+        if _processes is None:
+            _processes = ProcessPoolExecutor(WORKERS, mp_context=multiprocessing.get_context('fork'))
+            _threads = ThreadPoolExecutor(WORKERS)
+        return _processes, _threads
+
+def render_html(build, args):
+    """
+    Build a chart and serialize it, in a worker process when enabled
+
+    Parameters
+    ----------
+    build: function
+        a module level function returning an Altair chart, so that it can
+        be sent to the workers by name
+    args: tuple
+        the arguments of build, e.g. the cells of the chart
+
+    Returns
+    -------
+    str
+        the chart in html format
+    """
+    if not ENABLED:
+        return build(*args).to_html()
+    processes, _ = get_executors()
+    return processes.submit(_build_html, build, args).result()
+
+def _build_html(build, args):
+    return build(*args).to_html()
+
+def map_charts(function, items):
+    """
+    Call a function on every item, concurrently when enabled
+
+    Parameters
+    ----------
+    function: function
+        called with one item, e.g. to get one chart of a callback
+    items: list
+        the items, e.g. the kinds of heat map
+
+    Returns
+    -------
+    list
+        the results in the order of items
+    """
+    if not ENABLED:
+        return [function(item) for item in items]
+    _, threads = get_executors()
+    return list(threads.map(instrument.in_request(function), items))
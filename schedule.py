@@ -0,0 +1,245 @@
+"""
+Recommend how many staff to put on every department of every shift
+
+Every extra staff member in a department serves the customers the ones
+before could not, so each adds less than the last. That value is weighted
+up where satisfaction is low and reduced by the labour cost of the shift.
+The roster of a branch is the best of those staff shifts that fit in its
+headcount per shift and its weekly labour budget. The values of a
+department only fall, and the shift limits nest inside the branch budget.
+So picking the best staff shifts greedily is an optimal integer solution.
+The picking is array sorting over every branch at once. Run from the home
+directory with `python schedule.py --output data/roster.csv` to write the
+roster of every branch.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import aggregate
+import datastore
+from aggregate import DAYS, TIMES
+
+# Customers one staff member serves in a department over a shift
+CUSTOMERS_PER_STAFF = 5
+# Most staff on the floor of a branch at once, and fewest to open a shift
+MAX_STAFF = 4
+MIN_STAFF = 1
+# Labour cost of one staff shift and the weekly labour budget of a branch, in MMK
+STAFF_COST = 50.0
+BUDGET = 2000.0
+# How much more a served customer is worth at a rating of 0 than of 10
+SATISFACTION_WEIGHT = 0.5
+
+def make_inputs(cube, weeks):
+    """
+    Average the weekly traffic, spend and rating of every cube cell
+
+    Parameters
+    ----------
+    cube: pandas DataFrame
+        the output of aggregate.make_cube
+    weeks: float
+        the number of weeks the cube sums over
+
+    Returns
+    -------
+    dict
+        arrays of traffic per week, sales per customer and rating by branch,
+        day of week, time of day and product line, with the branches and
+        product lines
+    """
+    branches = list(cube.index.unique(level='Branch'))
+    products = list(cube.index.unique(level='Product line'))
+    metrics = aggregate.make_metrics(cube).fillna(0)
+    shape = (len(branches), len(DAYS), len(TIMES), len(products))
+    return {
+        'traffic': metrics['customer_traffic'].values.reshape(shape) / weeks,
+        'spend': metrics['transaction_size'].values.reshape(shape),
+        'rating': metrics['customer_satisfaction'].values.reshape(shape),
+        'branches': branches,
+        'products': products
+    }
+
+def make_gains(traffic, spend, rating, params):
+    """
+    Value every possible staff member of every cell, net of labour cost
+
+    Parameters
+    ----------
+    traffic: numpy array
+        customers per week by branch, day of week, time of day and product line
+    spend: numpy array
+        sales per customer of the same cells
+    rating: numpy array
+        average rating of the same cells
+    params: dict
+        the roster parameters, see solve
+
+    Returns
+    -------
+    numpy array
+        the value of the first to the MAX_STAFF-th staff member of every
+        cell along the last axis, decreasing along it
+    """
+    # The k-th staff member serves the customers beyond what k - 1 could
+    served_before = np.arange(params['max_staff']) * params['customers_per_staff']
+    served = np.clip(traffic[..., None] - served_before, 0, params['customers_per_staff'])
+    weight = 1 + params['satisfaction_weight'] * (10 - rating[..., None]) / 10
+    return served * spend[..., None] * weight - params['staff_cost']
+
+def allocate(gains, params):
+    """
+    Pick the best staff shifts of every branch within its limits
+
+    Parameters
+    ----------
+    gains: numpy array
+        the output of make_gains for some branches
+
+    params: dict
+        the roster parameters, see solve
+
+    Returns
+    -------
+    numpy array
+        the number of staff of every branch, day of week, time of day and
+        product line
+    """
+    branches, days, times, products, units = gains.shape
+    max_staff = params['max_staff']
+    per_shift = gains.reshape(branches, days * times, products * units)
+
+    # Only the best max_staff staff members of a shift can be on the floor
+    best = np.argsort(-per_shift, axis=2, kind='stable')[:, :, :max_staff]
+    best_gains = np.take_along_axis(per_shift, best, axis=2)
+
+    # Open every shift with the best MIN_STAFF whatever they cost, then
+    # add the most valuable staff shifts that pay for themselves
+    required = np.arange(max_staff) < params['min_staff']
+    priority = np.where(required, np.inf, best_gains).reshape(branches, -1)
+    order = np.argsort(-priority, axis=1, kind='stable')
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(order.shape[1])[None, :], axis=1)
+    affordable = int(params['budget'] // params['staff_cost']) if params['staff_cost'] > 0 else rank.shape[1]
+    keep = (((rank < affordable) & (priority > 0)) | np.isinf(priority)).reshape(branches, days * times, max_staff)
+
+    # Count the staff picked for each product line
+    staff = np.zeros((branches, days * times, products), dtype=int)
+    branch, shift, unit = np.nonzero(keep)
+    np.add.at(staff, (branch, shift, best[branch, shift, unit] // units), 1)
+    return staff.reshape(branches, days, times, products)
+
+def solve(inputs, previous=None, customers_per_staff=CUSTOMERS_PER_STAFF, max_staff=MAX_STAFF,
+          min_staff=MIN_STAFF, staff_cost=STAFF_COST, budget=BUDGET,
+          satisfaction_weight=SATISFACTION_WEIGHT):
+    """
+    Recommend the staff of every branch, shift and department for a week
+
+    Parameters
+    ----------
+    inputs: dict
+        the output of make_inputs
+    previous: dict
+        an earlier output of solve to start from, so that only the branches
+        whose inputs changed are solved again
+    customers_per_staff: float
+        the customers one staff member serves in a department over a shift
+    max_staff: int
+        the most staff on the floor of a branch at once
+    min_staff: int
+        the fewest staff on the floor of a branch during any shift
+    staff_cost: float
+        the labour cost of one staff shift
+    budget: float
+        the weekly labour budget of every branch
+    satisfaction_weight: float
+        how much more a served customer is worth at a rating of 0 than of 10
+
+    Returns
+    -------
+    dict
+        the staff by branch, day of week, time of day and product line, with
+        the inputs and parameters it was solved for
+    """
+    params = {'customers_per_staff': customers_per_staff, 'max_staff': int(max_staff),
+              'min_staff': min(int(min_staff), int(max_staff)), 'staff_cost': staff_cost,
+              'budget': budget, 'satisfaction_weight': satisfaction_weight}
+    arrays = ['traffic', 'spend', 'rating']
+
+    if (previous is not None and previous['params'] == params
+            and previous['inputs']['branches'] == inputs['branches']
+            and previous['inputs']['products'] == inputs['products']):
+        staff = previous['staff'].copy()
+        changed = np.zeros(len(inputs['branches']), dtype=bool)
+        for array in arrays:
+            changed |= (inputs[array] != previous['inputs'][array]).any(axis=(1, 2, 3))
+    else:
+        staff = None
+        changed = np.ones(len(inputs['branches']), dtype=bool)
+
+    if changed.any():
+        gains = make_gains(*[inputs[array][changed] for array in arrays], params)
+        if staff is None:
+            staff = allocate(gains, params)
+        else:
+            staff[changed] = allocate(gains, params)
+    return {'staff': staff, 'inputs': inputs, 'params': params, 'solved': int(changed.sum())}
+
+def to_frame(roster):
+    """
+    List the roster of every branch, shift and department
+
+    Parameters
+    ----------
+    roster: dict
+        the output of solve
+
+    Returns
+    -------
+    pandas DataFrame
+        the staff indexed by Branch, Day_of_week, Time_of_day and Product line
+    """
+    inputs = roster['inputs']
+    index = pd.MultiIndex.from_product([inputs['branches'], DAYS, TIMES, inputs['products']],
+                                       names=aggregate.CUBE_KEYS)
+    return pd.DataFrame({'staff': roster['staff'].ravel()}, index=index)
+
+def count_weeks(df):
+    """
+    Count the weeks of sales the cube sums over
+
+    Parameters
+    ----------
+    df: pandas DataFrame
+        the cleaned supermarket sales data
+
+    Returns
+    -------
+    float
+        the number of days with sales divided by 7
+    """
+    return df['Date_time'].dt.normalize().nunique() / len(DAYS)
+
+def main(output, **kwargs):
+    df = datastore.load()
+    roster = solve(make_inputs(aggregate.make_cube(df), count_weeks(df)), **kwargs)
+    to_frame(roster).to_csv(output)
+    staff_shifts = roster['staff'].sum(axis=(1, 2, 3))
+    print('Wrote the roster of {} branches to {}, {:.0f} staff shifts per branch on average'
+          .format(len(staff_shifts), output, staff_shifts.mean()))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recommend staff by branch, shift and department')
+    parser.add_argument('--output', default='data/roster.csv')
+    parser.add_argument('--customers-per-staff', type=float, default=CUSTOMERS_PER_STAFF)
+    parser.add_argument('--max-staff', type=int, default=MAX_STAFF)
+    parser.add_argument('--min-staff', type=int, default=MIN_STAFF)
+    parser.add_argument('--staff-cost', type=float, default=STAFF_COST)
+    parser.add_argument('--budget', type=float, default=BUDGET)
+    parser.add_argument('--satisfaction-weight', type=float, default=SATISFACTION_WEIGHT)
+    args = parser.parse_args()
+    main(args.output, customers_per_staff=args.customers_per_staff, max_staff=args.max_staff,
+         min_staff=args.min_staff, staff_cost=args.staff_cost, budget=args.budget,
+         satisfaction_weight=args.satisfaction_weight)
@@ -0,0 +1,66 @@
+"""
+Check the answers of the HTTP API against the cube behind the charts
+
+Run from the home directory with `python -m pytest tests`.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+os.environ.setdefault('WARM_CACHE', '0')
+import aggregate
+import app
+
+@pytest.fixture
+def client():
+    return app.server.test_client()
+
+def get_table(response):
+    body = response.get_json()
+    return pd.DataFrame(body['data'], columns=body['columns'])
+
+def test_filters(client):
+    response = client.get('/api/aggregates?branch=A&day_of_week=Monday,Friday&time_of_day=Evening')
+    table = get_table(response).set_index(aggregate.CUBE_KEYS)
+
+    expected = app.cube.xs('Evening', level='Time_of_day', drop_level=False)
+    expected = expected[expected.index.get_level_values('Branch') == 'A']
+    expected = expected[expected.index.get_level_values('Day_of_week').isin(['Monday', 'Friday'])]
+    assert response.status_code == 200
+    assert len(table) == len(expected)
+    pd.testing.assert_frame_equal(table[['total', 'count', 'rating']].sort_index(),
+                                  expected.sort_index(), check_dtype=False)
+
+def test_by(client):
+    table = get_table(client.get('/api/aggregates?by=Branch,Time_of_day'))
+    expected = app.cube.groupby(level=['Branch', 'Time_of_day']).sum()
+
+    table = table.set_index(['Branch', 'Time_of_day'])
+    assert list(table.columns[:3]) == ['total', 'count', 'rating']
+    pd.testing.assert_frame_equal(table[['total', 'count', 'rating']].sort_index(),
+                                  expected.sort_index(), check_dtype=False)
+    # The metrics are derived from the rolled up sums, not summed
+    assert table['transaction_size'].tolist() == pytest.approx((table['total'] / table['count']).tolist())
+
+def test_not_modified(client):
+    response = client.get('/api/aggregates?by=Branch')
+    etag = response.headers['ETag']
+
+    assert client.get('/api/aggregates?by=Branch', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/aggregates?by=Branch,Time_of_day', headers={'If-None-Match': etag}).status_code == 200
+
+def test_gzip(client):
+    assert client.get('/api/aggregates', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in client.get('/api/aggregates', headers={'Accept-Encoding': 'gzip;q=0'}).headers
+
+@pytest.mark.parametrize('query', [
+    'start=2019-03-01&end=2019-02-01',
+    'start=someday',
+    'by=City',
+    'format=xml'
+])
+def test_bad_query(client, query):
+    response = client.get('/api/aggregates?' + query)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
@@ -0,0 +1,105 @@
+"""
+Check that folding batches into the aggregates matches rebuilding them
+
+Run from the home directory with `python -m pytest tests`.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Keep background renders from racing the swaps under test
+os.environ.setdefault('WARM_CACHE', '0')
+import app
+import datastore
+import ingest
+
+RAW_PATH = 'data/supermarket_sales.csv'
+
+@pytest.fixture(autouse=True)
+def restore_sales():
+    yield
+    app.load_sales(datastore.load(app.DATA_PATH))
+
+@pytest.fixture
+def raw():
+    return ingest.read_raw(RAW_PATH)
+
+def get_state():
+    """
+    Copy the aggregates behind the charts
+
+    Returns
+    -------
+    dict
+        the aggregates that append_sales updates
+    """
+    return {
+        'cube': app.cube.copy(),
+        'heat_map_tables': dict(app.heat_map_tables),
+        'bar_plot_tables': dict(app.bar_plot_tables),
+        'slot_cube': app.slot_cube.copy(),
+        'daily_sums': app.daily_sums.copy(),
+        'prefix_sums': app.prefix_sums,
+        'branch_labels': dict(app.branch_labels),
+        'dates': (app.first_date, app.last_date)
+    }
+
+def assert_same_state(state, expected):
+    pd.testing.assert_frame_equal(state['cube'], expected['cube'], check_dtype=False)
+    pd.testing.assert_frame_equal(state['slot_cube'], expected['slot_cube'], check_dtype=False)
+    pd.testing.assert_frame_equal(state['daily_sums'], expected['daily_sums'], check_dtype=False)
+    for name in ['heat_map_tables', 'bar_plot_tables']:
+        assert state[name].keys() == expected[name].keys()
+        for key, table in expected[name].items():
+            pd.testing.assert_frame_equal(state[name][key], table, check_dtype=False)
+    np.testing.assert_array_equal(state['prefix_sums']['keys'], expected['prefix_sums']['keys'])
+    np.testing.assert_allclose(state['prefix_sums']['sums'], expected['prefix_sums']['sums'])
+    assert state['branch_labels'] == expected['branch_labels']
+    assert state['dates'] == expected['dates']
+
+def test_append_matches_rebuild(raw):
+    half = len(raw) // 2
+    app.load_sales(ingest.clean(raw.iloc[:half].copy()))
+    changed = app.append_sales(raw.iloc[half:].copy())
+    appended = get_state()
+
+    app.load_sales(ingest.clean(raw.copy()))
+    assert changed
+    assert_same_state(appended, get_state())
+
+def test_append_new_branch(raw):
+    batch = raw.head(50).copy()
+    batch['Branch'] = 'D'
+    batch['City'] = 'Bago'
+    app.append_sales(batch)
+    appended = get_state()
+
+    assert 'D' in app.branch_labels
+    assert 'D' in [option['value'] for option in app.store_options]
+    assert 'D' in str(app.serve_layout())
+
+    app.load_sales(ingest.clean(pd.concat([raw, batch], ignore_index=True)))
+    assert_same_state(appended, get_state())
+
+@pytest.mark.parametrize('make_batch', [
+    lambda raw: raw.iloc[:0],
+    lambda raw: raw.head(20).assign(Time='21:30')
+], ids=['header_only', 'after_hours'])
+def test_append_empty_batch(raw, make_batch):
+    before = get_state()
+    assert app.append_sales(make_batch(raw).copy()) == []
+    assert_same_state(get_state(), before)
+
+def test_failed_batch(raw, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'INCOMING_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'last_refresh', 0)
+    monkeypatch.setattr(app, 'failed_batches', set())
+    (tmp_path / 'bad.csv').write_text('Invoice ID,Branch\n750-67-8428,A\n')
+    before = get_state()
+
+    response = app.server.test_client().get('/api/aggregates')
+    assert response.status_code == 200
+    assert app.failed_batches == {'bad.csv'}
+    assert_same_state(get_state(), before)
@@ -0,0 +1,28 @@
+"""
+Check that the chart cache never keeps charts of replaced data
+
+Run from the home directory with `python -m pytest tests`.
+"""
+import threading
+
+import chart_cache
+
+def test_render_across_discard():
+    started, finish = threading.Event(), threading.Event()
+
+    def render_old():
+        started.set()
+        finish.wait()
+        return 'old'
+
+    key = ('heat_map', 'A', None, None)
+    thread = threading.Thread(target=chart_cache.get_html, args=(key, render_old))
+    thread.start()
+    started.wait()
+    # e.g. append_sales swapping in new sales while the chart renders
+    chart_cache.discard([key])
+    finish.set()
+    thread.join()
+
+    assert chart_cache.get_html(key, lambda: 'new') == 'new'
+    chart_cache.invalidate()
@@ -0,0 +1,47 @@
+"""
+Check the date range sums against the sales of the range
+
+Run from the home directory with `python -m pytest tests`.
+"""
+import os
+
+import pandas as pd
+import pytest
+
+os.environ.setdefault('WARM_CACHE', '0')
+import aggregate
+import app
+import datastore
+import ingest
+
+@pytest.fixture(scope='module')
+def sales():
+    return datastore.load(app.DATA_PATH)
+
+@pytest.mark.parametrize('start, end', [
+    ('2019-01-01', '2019-03-30'),
+    ('2019-01-05', '2019-01-05'),
+    ('2019-02-10', '2019-03-02'),
+    ('2018-12-01', '2019-01-03')
+])
+def test_query_prefix_sums(sales, start, end):
+    dates = sales['Date_time'].dt.normalize()
+    in_range = sales[(dates >= start) & (dates <= end)]
+    expected = aggregate.make_sums(in_range, aggregate.CUBE_KEYS,
+                                   [list(app.cube.index.unique(level=key)) for key in aggregate.CUBE_KEYS])
+
+    sums = aggregate.query_prefix_sums(app.prefix_sums, start, end)
+    pd.testing.assert_frame_equal(sums, expected, check_dtype=False)
+
+def test_range_after_refresh():
+    batch = ingest.read_raw('data/supermarket_sales.csv').head(20).assign(Date='4/15/2019')
+    try:
+        app.append_sales(batch)
+        assert app.last_date == pd.Timestamp('2019-04-15')
+        # The default range takes in the new day
+        assert app.get_date_range(None, None) is None
+        sums = aggregate.query_prefix_sums(app.prefix_sums, '2019-04-15', '2019-04-15')
+        assert sums['count'].sum() == len(batch)
+        assert sums['total'].sum() == pytest.approx(batch['Total'].sum())
+    finally:
+        app.load_sales(datastore.load(app.DATA_PATH))
@@ -0,0 +1,47 @@
+"""
+Check the greedy roster against every roster of a small case
+
+Run from the home directory with `python -m pytest tests`.
+"""
+import itertools
+
+import numpy as np
+import pytest
+
+import schedule
+
+def get_value(gains, staff):
+    """Sum the gains of the first staff members of every cell"""
+    units = np.arange(gains.shape[-1])
+    return gains[units < staff[..., None]].sum()
+
+def brute_force(gains, params):
+    """Try every roster of one branch within its limits"""
+    cells = gains.shape[1:4]
+    affordable = int(params['budget'] // params['staff_cost'])
+    best = -np.inf
+    for counts in itertools.product(range(params['max_staff'] + 1), repeat=int(np.prod(cells))):
+        staff = np.array(counts).reshape((1,) + cells)
+        per_shift = staff.sum(axis=3)
+        if (per_shift > params['max_staff']).any() or (per_shift < params['min_staff']).any():
+            continue
+        if staff.sum() > affordable:
+            continue
+        best = max(best, get_value(gains, staff))
+    return best
+
+@pytest.mark.parametrize('seed', range(20))
+def test_allocate_is_optimal(seed):
+    random = np.random.RandomState(seed)
+    shape = (1, 1, 2, 3)
+    params = {'customers_per_staff': 5, 'max_staff': 3, 'min_staff': 1,
+              'staff_cost': random.uniform(20, 80), 'satisfaction_weight': 0.5}
+    params['budget'] = params['staff_cost'] * random.randint(2, 6)
+    gains = schedule.make_gains(random.uniform(0, 15, shape), random.uniform(5, 30, shape),
+                                random.uniform(4, 10, shape), params)
+
+    staff = schedule.allocate(gains, params)
+    assert (staff.sum(axis=3) <= params['max_staff']).all()
+    assert (staff.sum(axis=3) >= params['min_staff']).all()
+    assert staff.sum() <= params['budget'] // params['staff_cost']
+    assert get_value(gains, staff) == pytest.approx(brute_force(gains, params))